@@ -7,7 +7,7 @@ from sqlalchemy.orm import Session
 from typing import Optional
 
 from app.core.database import get_db
-from app.core.security import verify_password, create_access_token, get_password_hash
+from app.core.security import verify_password, create_user_token, get_password_hash
 from app.models.user import User
 from app.models.check import Check
 from app.models.order import Order
@@ -69,7 +69,7 @@ def register(request: RegisterRequest, db: Session = Depends(get_db)):
             # Don't fail registration if migration fails, just log the error
 
     # Create access token (auto-login)
-    access_token = create_access_token(data={"sub": str(new_user.id)})
+    access_token = create_user_token(new_user.id)
 
     return ApiResponse(
         code=200,
@@ -125,7 +125,7 @@ def login(request: LoginRequest, db: Session = Depends(get_db)):
             # Don't fail login if migration fails, just log the error
 
     # Create access token
-    access_token = create_access_token(data={"sub": str(user.id)})
+    access_token = create_user_token(user.id)
 
     return ApiResponse(
         code=200,
@@ -3,17 +3,20 @@ Document Check API Routes
 Handles document upload and format checking.
 """
 import os
-import json
+import asyncio
+import hashlib
+import orjson
 import uuid
 import re
 import logging
+import weakref
 from datetime import datetime
-from typing import Optional, Tuple
+from typing import Awaitable, Callable, Optional, Tuple
 from fastapi import APIRouter, Depends, UploadFile, File, Form
 from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-import aiofiles
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +27,7 @@ from app.api.schemas import (
     ApiResponse,
     CheckSubmitRequest,
 )
-from app.api.deps import get_current_user, get_current_user_optional, check_count_available, reset_free_count_if_needed
+from app.api.deps import get_current_user, get_current_user_optional, check_count_available, deduct_count, reset_free_count_if_needed
 from app.services.docx_parser import parse_document_safe
 from app.services.rule_engine import create_rule_engine, load_rules_from_db_objects
 from app.services.ai_checker import create_ai_checker
@@ -40,6 +43,10 @@ _ai_checker = create_ai_checker()
 # Create AI content checker instance (shared across requests)
 _ai_content_checker = create_ai_content_checker()
 
+# One lock per check being revised, so concurrent /revise calls for the same
+# check generate the document once; entries go away with their last waiter
+_revision_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
 
 def _is_guest_user(username: str) -> bool:
     """Check if user is a guest user based on username prefix."""
@@ -87,6 +94,137 @@ def _find_uploaded_file(user_id: int, file_id: str) -> Tuple[Optional[str], Opti
     return file_path, filename
 
 
+def _save_upload(user_id: int, filename: str, content: bytes) -> str:
+    """
+    Write an uploaded document into the user's upload directory.
+
+    Blocking; call it through run_in_threadpool so directory creation,
+    open, write and close share a single worker-thread hop.
+
+    Returns:
+        Path of the saved file
+    """
+    user_upload_dir = os.path.join(settings.UPLOAD_DIR, str(user_id))
+    os.makedirs(user_upload_dir, exist_ok=True)
+    file_path = os.path.join(user_upload_dir, filename)
+    with open(file_path, "wb") as f:
+        f.write(content)
+    return file_path
+
+
+class DocumentParseError(Exception):
+    """Raised when an uploaded document cannot be parsed."""
+
+
+async def run_document_check(
+    file_path: str,
+    check_type: str,
+    rule_config: Optional[dict],
+    db: Session
+) -> dict:
+    """
+    Parse a document and run the format check pipeline on it.
+
+    Args:
+        file_path: Path to the uploaded .docx file
+        check_type: Type of check (basic or full)
+        rule_config: Rule template config, or None to use database rules
+        db: Database session
+
+    Returns:
+        Check result dict (issues, total_issues, check_type, ...)
+
+    Raises:
+        DocumentParseError: If the document cannot be parsed
+    """
+    # Parse document
+    parse_result = parse_document_safe(file_path)
+    if not parse_result["success"]:
+        raise DocumentParseError(parse_result.get("error", "Unknown error"))
+
+    doc_data = parse_result["data"]
+    logger.info(f"文档解析成功: {len(doc_data.get('paragraphs', []))} 个段落")
+
+    # Load rules - use template config if provided, otherwise load from database
+    if rule_config:
+        # Convert template config to rule format
+        from app.services.rule_engine import config_to_rules
+        # Also load DB rules to match fix_action and fix_params
+        db_rules = db.query(Rule).all()
+        db_rule_dicts = load_rules_from_db_objects(db_rules)
+        rule_dicts = config_to_rules(rule_config, db_rules=db_rule_dicts)
+    else:
+        # Load from database (default behavior)
+        rules = db.query(Rule).all()
+        rule_dicts = load_rules_from_db_objects(rules)
+
+        # Debug: Log rules with fix_action
+        rules_with_fix = [r for r in rule_dicts if r.get("fix_action")]
+        logger.info(f"加载了 {len(rule_dicts)} 条规则，其中 {len(rules_with_fix)} 条有 fix_action")
+        for rule in rules_with_fix:
+            logger.debug(f"Rule {rule.get('id')}: fix_action={rule.get('fix_action')}")
+
+    logger.info(f"加载了 {len(rule_dicts)} 条规则")
+
+    # ============================================================
+    # 检测流程：基础检测 vs 全面检测
+    # ============================================================
+    is_full_check = check_type == "full"
+
+    if is_full_check:
+        # ========== 全面检测 ==========
+        logger.info("开始全面检测...")
+
+        # 1. 规则检测（仅确定性规则，不包含AI规则）
+        deterministic_rules = [r for r in rule_dicts if r.get("checker") != "ai"]
+        logger.info(f"确定性规则数量: {len(deterministic_rules)}")
+
+        rule_engine = create_rule_engine(deterministic_rules, enable_ai=False)
+        rule_result = rule_engine.check_document_sync(doc_data)
+        logger.info(f"规则检测完成: {rule_result.get('total_issues', 0)} 个问题")
+
+        # 2. AI内容检测（错别字、交叉引用等）
+        ai_issues = []
+        if _ai_content_checker.is_enabled():
+            try:
+                enabled_checks = ["spell_check", "cross_ref_check"]
+                logger.info("开始AI内容检测...")
+                ai_results = await _ai_content_checker.check_all(doc_data, enabled_checks)
+                ai_issues = _ai_content_checker.convert_to_standard_issues(ai_results)
+                logger.info(f"AI内容检测完成: {len(ai_issues)} 个问题")
+            except Exception as e:
+                logger.error(f"AI内容检测失败: {e}", exc_info=True)
+        else:
+            logger.warning("AI内容检测未启用")
+
+        # 合并结果
+        all_issues = rule_result.get("issues", []) + ai_issues
+        check_result = {
+            "issues": all_issues,
+            "total_issues": len(all_issues),
+            "check_type": "full",
+            "rule_issues": len(rule_result.get("issues", [])),
+            "ai_issues": len(ai_issues),
+        }
+        logger.info(f"全面检测完成: 共 {len(all_issues)} 个问题")
+    else:
+        # ========== 基础检测 ==========
+        logger.info("开始基础检测...")
+        # 仅运行确定性规则（格式检查）
+        deterministic_rules = [r for r in rule_dicts if r.get("checker") != "ai"]
+        rule_engine = create_rule_engine(deterministic_rules, enable_ai=False)
+        check_result = rule_engine.check_document_sync(doc_data)
+        check_result["check_type"] = "basic"
+        logger.info(f"基础检测完成: {check_result.get('total_issues', 0)} 个问题")
+
+    return check_result
+
+
+def get_check_runner() -> Callable[..., Awaitable[dict]]:
+    """Dependency providing the check pipeline (overridable in tests)."""
+    return run_document_check
+
+
 @router.post("/upload", response_model=ApiResponse)
 async def upload_document(
     file: UploadFile = File(...),
@@ -130,17 +268,10 @@ async def upload_document(
     # Generate file ID
     file_id = f"file_{uuid.uuid4().hex[:16]}"
 
-    # Create user upload directory
-    user_upload_dir = os.path.join(settings.UPLOAD_DIR, str(current_user.id))
-    os.makedirs(user_upload_dir, exist_ok=True)
-
     # Save file (include file_id in filename)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     safe_filename = f"{timestamp}_{file_id}_{file.filename}"
-    file_path = os.path.join(user_upload_dir, safe_filename)
-
-    async with aiofiles.open(file_path, "wb") as f:
-        await f.write(content)
+    await run_in_threadpool(_save_upload, current_user.id, safe_filename, content)
 
     return ApiResponse(
         code=200,
@@ -159,7 +290,8 @@ async def upload_document(
 async def submit_check(
     request: CheckSubmitRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    run_check: Callable[..., Awaitable[dict]] = Depends(get_check_runner)
 ):
     """
     Submit a document for format checking.
@@ -168,6 +300,7 @@ async def submit_check(
         request: Check submit request with file_id
         current_user: Current authenticated user
         db: Database session
+        run_check: Document check pipeline
 
     Returns:
         API response with check_id
@@ -175,8 +308,10 @@ async def submit_check(
     # Reset free count if needed
     reset_free_count_if_needed(current_user, db)
 
-    # Check count availability and determine cost type
-    cost_type = check_count_available(current_user, request.check_type)
+    # Fail fast (403) before the file lookup if the user has no count left.
+    # This is only a guard: its cost type is not used, since deduct_count
+    # below picks the column and re-checks availability atomically.
+    check_count_available(current_user, request.check_type)
 
     # Find uploaded file
     file_path, filename = _find_uploaded_file(current_user.id, request.file_id)
@@ -203,6 +338,10 @@ async def submit_check(
                 data=None
             )
 
+    # Deduct the count; this re-checks availability in the same statement,
+    # so concurrent submissions cannot overdraw it
+    cost_type = deduct_count(current_user, request.check_type, db)
+
     # Create check record
     new_check = Check(
         check_id=check_id,
@@ -218,14 +357,6 @@ async def submit_check(
     )
     db.add(new_check)
 
-    # Decrement the appropriate count based on cost_type
-    if cost_type == "free":
-        current_user.free_count -= 1
-    elif cost_type == "basic":
-        current_user.basic_count -= 1
-    elif cost_type == "full":
-        current_user.full_count -= 1
-
     # Update user's last_template_id
     if request.rule_template_id:
         current_user.last_template_id = request.rule_template_id
@@ -239,98 +370,22 @@ async def submit_check(
     try:
         logger.info(f"开始执行检查: check_id={check_id}, check_type={request.check_type}")
 
-        # Parse document
-        parse_result = parse_document_safe(file_path)
-        if not parse_result["success"]:
-            new_check.status = CheckStatus.FAILED
-            db.commit()
-            return ApiResponse(
-                code=3003,
-                message=f"文档解析失败: {parse_result.get('error', 'Unknown error')}",
-                data=None
-            )
-
-        doc_data = parse_result["data"]
-        logger.info(f"文档解析成功: {len(doc_data.get('paragraphs', []))} 个段落")
-
-        # Load rules - use template config if provided, otherwise load from database
-        if rule_config:
-            # Convert template config to rule format
-            from app.services.rule_engine import config_to_rules
-            # Also load DB rules to match fix_action and fix_params
-            db_rules = db.query(Rule).all()
-            db_rule_dicts = load_rules_from_db_objects(db_rules)
-            rule_dicts = config_to_rules(rule_config, db_rules=db_rule_dicts)
-        else:
-            # Load from database (default behavior)
-            rules = db.query(Rule).all()
-            rule_dicts = load_rules_from_db_objects(rules)
-            
-            # Debug: Log rules with fix_action
-            rules_with_fix = [r for r in rule_dicts if r.get("fix_action")]
-            logger.info(f"加载了 {len(rule_dicts)} 条规则，其中 {len(rules_with_fix)} 条有 fix_action")
-            for rule in rules_with_fix:
-                logger.debug(f"Rule {rule.get('id')}: fix_action={rule.get('fix_action')}")
-
-        logger.info(f"加载了 {len(rule_dicts)} 条规则")
-
-        # ============================================================
-        # 检测流程：基础检测 vs 全面检测
-        # ============================================================
-        is_full_check = request.check_type == "full"
-
-        if is_full_check:
-            # ========== 全面检测 ==========
-            logger.info("开始全面检测...")
-
-            # 1. 规则检测（仅确定性规则，不包含AI规则）
-            deterministic_rules = [r for r in rule_dicts if r.get("checker") != "ai"]
-            logger.info(f"确定性规则数量: {len(deterministic_rules)}")
-
-            rule_engine = create_rule_engine(deterministic_rules, enable_ai=False)
-            rule_result = rule_engine.check_document_sync(doc_data)
-            logger.info(f"规则检测完成: {rule_result.get('total_issues', 0)} 个问题")
-
-            # 2. AI内容检测（错别字、交叉引用等）
-            ai_issues = []
-            if _ai_content_checker.is_enabled():
-                try:
-                    enabled_checks = ["spell_check", "cross_ref_check"]
-                    logger.info("开始AI内容检测...")
-                    ai_results = await _ai_content_checker.check_all(doc_data, enabled_checks)
-                    ai_issues = _ai_content_checker.convert_to_standard_issues(ai_results)
-                    logger.info(f"AI内容检测完成: {len(ai_issues)} 个问题")
-                except Exception as e:
-                    logger.error(f"AI内容检测失败: {e}", exc_info=True)
-            else:
-                logger.warning("AI内容检测未启用")
-
-            # 合并结果
-            all_issues = rule_result.get("issues", []) + ai_issues
-            check_result = {
-                "issues": all_issues,
-                "total_issues": len(all_issues),
-                "check_type": "full",
-                "rule_issues": len(rule_result.get("issues", [])),
-                "ai_issues": len(ai_issues),
-            }
-            logger.info(f"全面检测完成: 共 {len(all_issues)} 个问题")
-        else:
-            # ========== 基础检测 ==========
-            logger.info("开始基础检测...")
-            # 仅运行确定性规则（格式检查）
-            deterministic_rules = [r for r in rule_dicts if r.get("checker") != "ai"]
-            rule_engine = create_rule_engine(deterministic_rules, enable_ai=False)
-            check_result = rule_engine.check_document_sync(doc_data)
-            check_result["check_type"] = "basic"
-            logger.info(f"基础检测完成: {check_result.get('total_issues', 0)} 个问题")
+        check_result = await run_check(file_path, request.check_type, rule_config, db)
 
         # Save result
-        result_json = json.dumps(check_result, ensure_ascii=False)
+        result_json = orjson.dumps(check_result, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
         new_check.result_json = result_json
         db.commit()
         logger.info(f"检查结果已保存: check_id={check_id}")
 
+    except DocumentParseError as e:
+        new_check.status = CheckStatus.FAILED
+        db.commit()
+        return ApiResponse(
+            code=3003,
+            message=f"文档解析失败: {e}",
+            data=None
+        )
     except Exception as e:
         new_check.status = CheckStatus.FAILED
         db.commit()
@@ -348,6 +403,12 @@ async def submit_check(
             "file_id": request.file_id,
             "filename": filename,
             "check_type": request.check_type,
+            "cost_type": cost_type,
+            "remaining_counts": {
+                "free": current_user.free_count,
+                "basic": current_user.basic_count,
+                "full": current_user.full_count,
+            },
             "status": "completed",
             "created_at": new_check.created_at.isoformat(),
         }
@@ -394,7 +455,7 @@ def get_recent_checks(
             "updated_at": check.updated_at.isoformat() if check.updated_at else None,
         }
         if check.result_json:
-            result = json.loads(check.result_json)
+            result = orjson.loads(check.result_json)
             check_dict["total_issues"] = result.get("total_issues", 0)
         else:
             check_dict["total_issues"] = 0
@@ -456,9 +517,9 @@ def get_user_stats(
     for check in checks_with_issues:
         if check.result_json:
             try:
-                result = json.loads(check.result_json)
+                result = orjson.loads(check.result_json)
                 total_issues += result.get("total_issues", 0)
-            except (json.JSONDecodeError, TypeError):
+            except (orjson.JSONDecodeError, TypeError):
                 pass
 
     return ApiResponse(
@@ -493,67 +554,74 @@ async def generate_revised_document(
     if check.status != CheckStatus.COMPLETED:
         return ApiResponse(code=3005, message="检查未完成，无法生成修订版", data=None)
 
-    # Check if already generated
-    if check.revised_file_path and os.path.exists(check.revised_file_path):
-        return ApiResponse(
-            code=200,
-            message="修订版已生成",
-            data={"revised_file_url": f"/api/check/{check_id}/download_revised"}
-        )
+    async with _revision_locks.setdefault(check_id, asyncio.Lock()):
+        # A concurrent request may have generated it while we waited
+        db.refresh(check)
+
+        # Reuse the revised document if it was generated from this same result
+        result_hash = hashlib.sha256((check.result_json or "").encode("utf-8")).hexdigest()
+        if (check.revised_file_path and check.revised_result_hash == result_hash
+                and os.path.exists(check.revised_file_path)):
+            return ApiResponse(
+                code=200,
+                message="修订版已生成",
+                data={"revised_file_url": f"/api/check/{check_id}/download_revised"}
+            )
 
-    # Generate
-    try:
-        # Load check result
-        result = json.loads(check.result_json)
-        issues = result.get("issues", [])
-        
-        # Log for debugging
-        logger.info(f"Generating revised document for check {check_id}")
-        logger.info(f"Found {len(issues)} issues to process")
-        
-        # Debug: Log each issue's rule_id and fix_action
-        for i, issue in enumerate(issues, 1):
-            rule_id = issue.get("rule_id", "Unknown")
-            fix_action = issue.get("fix_action")
-            logger.info(f"Issue {i}: rule_id={rule_id}, fix_action={fix_action}")
-        
-        # Count issues with fix_action
-        issues_with_fix = [i for i in issues if i.get("fix_action")]
-        logger.info(f"Found {len(issues_with_fix)} issues with fix_action")
-        
-        if not issues_with_fix:
-            logger.warning("No issues with fix_action found - revision may not show changes")
-            # Debug: Check if rules have fix_action
-            rules = db.query(Rule).all()
-            rule_fix_map = {r.id: r.fix_action for r in rules if r.fix_action}
-            logger.info(f"Rules with fix_action in DB: {list(rule_fix_map.keys())}")
-            for issue in issues:
-                rule_id = issue.get("rule_id")
-                if rule_id in rule_fix_map:
-                    logger.warning(f"Issue {rule_id} should have fix_action={rule_fix_map[rule_id]} but doesn't!")
-        
-        # Initialize revision engine
-        user_upload_dir = os.path.dirname(check.file_path)
-        engine = RevisionEngine(check.file_path, user_upload_dir)
-        
         # Generate
-        revised_path = engine.generate_revised_document(issues)
-        
-        # Update DB
-        check.revised_file_path = revised_path
-        db.commit()
-        
-        logger.info(f"Revised document generated: {revised_path}")
-        
-        return ApiResponse(
-            code=200,
-            message="修订版生成成功",
-            data={"revised_file_url": f"/api/check/{check_id}/download_revised"}
-        )
-        
-    except Exception as e:
-        logger.error(f"Failed to generate revised document: {e}", exc_info=True)
-        return ApiResponse(code=3006, message=f"生成修订版失败: {str(e)}", data=None)
+        try:
+            # Load check result
+            result = orjson.loads(check.result_json)
+            issues = result.get("issues", [])
+
+            # Log for debugging
+            logger.info(f"Generating revised document for check {check_id}")
+            logger.info(f"Found {len(issues)} issues to process")
+
+            # Debug: Log each issue's rule_id and fix_action
+            for i, issue in enumerate(issues, 1):
+                rule_id = issue.get("rule_id", "Unknown")
+                fix_action = issue.get("fix_action")
+                logger.info(f"Issue {i}: rule_id={rule_id}, fix_action={fix_action}")
+
+            # Count issues with fix_action
+            issues_with_fix = [i for i in issues if i.get("fix_action")]
+            logger.info(f"Found {len(issues_with_fix)} issues with fix_action")
+
+            if not issues_with_fix:
+                logger.warning("No issues with fix_action found - revision may not show changes")
+                # Debug: Check if rules have fix_action
+                rules = db.query(Rule).all()
+                rule_fix_map = {r.id: r.fix_action for r in rules if r.fix_action}
+                logger.info(f"Rules with fix_action in DB: {list(rule_fix_map.keys())}")
+                for issue in issues:
+                    rule_id = issue.get("rule_id")
+                    if rule_id in rule_fix_map:
+                        logger.warning(f"Issue {rule_id} should have fix_action={rule_fix_map[rule_id]} but doesn't!")
+
+            # Initialize revision engine
+            user_upload_dir = os.path.dirname(check.file_path)
+            engine = RevisionEngine(check.file_path, user_upload_dir)
+
+            # Generate
+            revised_path = await run_in_threadpool(engine.generate_revised_document, issues)
+
+            # Update DB
+            check.revised_file_path = revised_path
+            check.revised_result_hash = result_hash
+            db.commit()
+
+            logger.info(f"Revised document generated: {revised_path}")
+
+            return ApiResponse(
+                code=200,
+                message="修订版生成成功",
+                data={"revised_file_url": f"/api/check/{check_id}/download_revised"}
+            )
+
+        except Exception as e:
+            logger.error(f"Failed to generate revised document: {e}", exc_info=True)
+            return ApiResponse(code=3006, message=f"生成修订版失败: {str(e)}", data=None)
 
 
 @router.get("/{check_id}", response_model=ApiResponse)
@@ -592,7 +660,7 @@ def get_check_result(
     response_data["revised_file_generated"] = bool(check.revised_file_path)
 
     if check.status == CheckStatus.COMPLETED and check.result_json:
-        result = json.loads(check.result_json)
+        result = orjson.loads(check.result_json)
         response_data["result"] = result
     elif check.status == CheckStatus.FAILED:
         response_data["error_message"] = "检查执行失败"
@@ -621,13 +689,21 @@ async def download_revised_document(
     # SECURITY NOTE: This exposes files if check_id is guessed. Production needs better auth.
     check = db.query(Check).filter(Check.check_id == check_id).first()
     
-    if not check or not check.revised_file_path or not os.path.exists(check.revised_file_path):
+    if not check or not check.revised_file_path:
         return ApiResponse(code=404, message="文件不存在", data=None)
-        
+
+    # Stat once here and hand the result to FileResponse, which would
+    # otherwise stat the file again before streaming it
+    try:
+        stat_result = os.stat(check.revised_file_path)
+    except FileNotFoundError:
+        return ApiResponse(code=404, message="文件不存在", data=None)
+
     filename = os.path.basename(check.revised_file_path)
     # Return as attachment
     return FileResponse(
-        check.revised_file_path, 
+        check.revised_file_path,
+        stat_result=stat_result,
         filename=filename,
         media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
     )
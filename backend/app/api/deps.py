@@ -4,6 +4,7 @@ Common dependencies for API routes.
 """
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from typing import Optional
 
@@ -15,6 +16,13 @@ from app.models import User
 security = HTTPBearer()
 optional_security = HTTPBearer(auto_error=False)
 
+# User column holding each cost type's remaining count
+_COUNT_COLUMNS = {
+    "free": User.free_count,
+    "basic": User.basic_count,
+    "full": User.full_count,
+}
+
 
 def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
@@ -129,10 +137,7 @@ def check_count_available(user: User, check_type: str) -> str:
     if check_type == "full":
         # Full check only uses full_count
         if user.full_count <= 0:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="完整检测次数不足，请购买检测包",
-            )
+            raise _count_exhausted(check_type)
         return "full"
     else:  # basic
         # Basic check uses free_count first, then basic_count
@@ -141,7 +146,46 @@ def check_count_available(user: User, check_type: str) -> str:
         elif user.basic_count > 0:
             return "basic"
         else:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="检测次数不足，请购买检测包",
-            )
+            raise _count_exhausted(check_type)
+
+
+def deduct_count(user: User, check_type: str, db: Session) -> str:
+    """
+    Deduct one check from the user's counts.
+
+    Each attempt is a single conditional UPDATE (count = count - 1 WHERE
+    count > 0), so two concurrent submissions cannot both spend the last
+    remaining check. The caller commits and refreshes `user`.
+
+    Args:
+        user: User object
+        check_type: Type of check ("basic" or "full")
+        db: Database session
+
+    Returns:
+        The cost type that was used ("free", "basic", or "full")
+
+    Raises:
+        HTTPException: If no available count
+    """
+    cost_types = ["full"] if check_type == "full" else ["free", "basic"]
+    for cost_type in cost_types:
+        column = _COUNT_COLUMNS[cost_type]
+        result = db.execute(
+            update(User)
+            .where(User.id == user.id, column > 0)
+            .values({column: column - 1})
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            return cost_type
+
+    raise _count_exhausted(check_type)
+
+
+def _count_exhausted(check_type: str) -> HTTPException:
+    """Build the 403 raised when the user has no count left for check_type."""
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="完整检测次数不足，请购买检测包" if check_type == "full" else "检测次数不足，请购买检测包",
+    )
@@ -4,7 +4,7 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.core.database import get_db
-from app.core.security import create_access_token, get_password_hash
+from app.core.security import create_user_token, get_password_hash
 from app.models.user import User
 from datetime import timedelta
 import uuid
@@ -42,8 +42,8 @@ async def init_guest_session(db: Session = Depends(get_db)):
 
     # 生成临时访问 Token（7天有效）
     # 使用 user.id 而不是 username，与正式用户保持一致
-    access_token = create_access_token(
-        data={"sub": str(guest_user.id)},
+    access_token = create_user_token(
+        guest_user.id,
         expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
 
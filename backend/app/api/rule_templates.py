@@ -2,9 +2,10 @@
 Rule Template API Routes
 Handles rule template CRUD, AI parsing, and docx reverse engineering.
 """
-from fastapi import APIRouter, Depends, Query, UploadFile, File, Body
+from fastapi import APIRouter, Depends, Query, UploadFile, File, Body, Response
 from sqlalchemy.orm import Session
 from typing import Optional, List
+import hashlib
 import logging
 import json
 from datetime import datetime
@@ -17,11 +18,15 @@ from app.api.schemas import ApiResponse
 from app.api.deps import get_current_user, get_current_user_optional
 from app.services.docx_parser import DocxParser
 from app.services.ai_rule_parser import AIRuleParser
+from app.utils.lru_cache import LRUCache
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/rule-templates", tags=["Rule Templates"])
 
+# Parsed /parse/docx results by SHA-256 of the uploaded file
+_docx_parse_cache = LRUCache(max_entries=64, max_bytes=64 * 1024 * 1024)
+
 
 # Request models
 class RuleTemplateCreateRequest(BaseModel):
@@ -257,6 +262,7 @@ async def parse_text_to_rule(
 
 @router.post("/parse/docx", response_model=ApiResponse)
 async def parse_docx_to_rule(
+    response: Response,
     file: UploadFile = File(..., description="上传的docx范文文件"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -265,14 +271,22 @@ async def parse_docx_to_rule(
     B通道：范文逆向克隆
 
     上传格式完美的docx范文，逆向解析出规则配置
+    同一文件（按内容SHA-256）的解析结果会被缓存，ETag 为该摘要
     """
     try:
+        content = await file.read()
+        content_hash = hashlib.sha256(content).hexdigest()
+
+        cached = _docx_parse_cache.get(content_hash)
+        if cached is not None:
+            response.headers["ETag"] = f'"{content_hash}"'
+            return ApiResponse(code=200, message="解析成功", data=cached)
+
         # 保存上传文件
         import tempfile
         import os
 
         with tempfile.NamedTemporaryFile(delete=False, suffix=".docx") as tmp_file:
-            content = await file.read()
             tmp_file.write(content)
             tmp_file_path = tmp_file.name
 
@@ -293,6 +307,9 @@ async def parse_docx_to_rule(
                 }
             }
 
+            _docx_parse_cache.put(content_hash, result_data, size=len(content))
+
+            response.headers["ETag"] = f'"{content_hash}"'
             return ApiResponse(
                 code=200,
                 message="解析成功",
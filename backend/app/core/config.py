@@ -19,6 +19,7 @@ class Settings(BaseSettings):
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 10080  # 7 days
+    BCRYPT_ROUNDS: int = 12  # Password hash cost; tests lower it
 
     # Upload
     UPLOAD_DIR: str = "uploads"
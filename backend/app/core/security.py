@@ -5,7 +5,7 @@ from passlib.context import CryptContext
 from app.core.config import settings
 
 # Password hashing context
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -30,6 +30,11 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
+def create_user_token(user_id: int, expires_delta: Optional[timedelta] = None) -> str:
+    """Create an access token whose subject is the given user id."""
+    return create_access_token(data={"sub": str(user_id)}, expires_delta=expires_delta)
+
+
 def decode_access_token(token: str) -> Optional[dict]:
     """Decode a JWT access token."""
     try:
@@ -32,6 +32,7 @@ class Check(Base):
     filename = Column(String(255), nullable=False, comment="文件名")
     file_path = Column(String(500), nullable=False, comment="文件存储路径")
     revised_file_path = Column(String(500), nullable=True, comment="修订版文件存储路径")
+    revised_result_hash = Column(String(64), nullable=True, comment="生成修订版时检查结果的SHA-256")
     check_type = Column(Enum(CheckType), default=CheckType.BASIC, comment="检查类型")
     status = Column(Enum(CheckStatus), default=CheckStatus.PENDING, comment="检查状态")
     result_json = Column(Text, comment="检查结果（JSON格式）")
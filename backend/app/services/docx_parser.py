@@ -6,9 +6,12 @@ from docx import Document
 from docx.shared import Pt
 from docx.enum.text import WD_ALIGN_PARAGRAPH
 from typing import Dict, List, Any, Optional
+import hashlib
 import re
 import os
 
+from app.utils.lru_cache import LRUCache
+
 
 class DocxParser:
     """Parser for Microsoft Word (.docx) documents."""
@@ -703,10 +706,36 @@ class DocxParser:
         return tree
 
 
+# Parsed documents keyed by SHA-256 of the file content. Re-checking an
+# unchanged document (same upload submitted again, revision round-trips)
+# skips python-docx/lxml parsing entirely. Bounded by entry count and by the
+# total size of the source files, which the parsed results grow with.
+_PARSE_CACHE = LRUCache(max_entries=64, max_bytes=64 * 1024 * 1024)
+
+
+def _sha256_file(file_path: str) -> str:
+    """Hex SHA-256 of a file, streamed through OpenSSL where available."""
+    with open(file_path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):  # Python 3.11+
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256(usedforsecurity=False)
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+        return h.hexdigest()
+
+
+def clear_parse_cache() -> None:
+    """Drop all cached parse results."""
+    _PARSE_CACHE.clear()
+
+
 def parse_document_safe(file_path: str) -> Dict[str, Any]:
     """
     Safely parse a document with error handling.
 
+    Results are cached by content hash, so parsing the same bytes again
+    (under any file name) returns a copy of the earlier result.
+
     Args:
         file_path: Path to the document file
 
@@ -714,8 +743,18 @@ def parse_document_safe(file_path: str) -> Dict[str, Any]:
         Dictionary with success status and data or error
     """
     try:
-        parser = DocxParser(file_path)
-        data = parser.parse()
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        digest = _sha256_file(file_path)
+
+        # The cache stores and returns copies, so callers may annotate the result
+        data = _PARSE_CACHE.get(digest)
+        if data is None:
+            parser = DocxParser(file_path)
+            data = parser.parse()
+            _PARSE_CACHE.put(digest, data, size=os.path.getsize(file_path))
+
+        data["info"]["filename"] = os.path.basename(file_path)
         return {"success": True, "data": data}
     except FileNotFoundError as e:
         return {"success": False, "error": str(e), "error_type": "FileNotFoundError"}
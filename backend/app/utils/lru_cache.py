@@ -0,0 +1,51 @@
+"""
+Small in-process LRU cache for parsed documents.
+"""
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+import copy
+
+
+class LRUCache:
+    """
+    Least-recently-used cache bounded by entry count and total size.
+
+    Parsed structures are hard to measure in memory, so each entry is
+    weighed by a caller-supplied size, typically the source document's
+    byte length, which grows with the parsed result. Values are deep-copied
+    on the way in and out so callers can modify what they get back.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return a copy of the cached value, or None on a miss."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return copy.deepcopy(entry[0])
+
+    def put(self, key: Hashable, value: Any, size: int) -> None:
+        """Cache a copy of value; values larger than max_bytes are not cached."""
+        if key in self._entries:
+            self.total_bytes -= self._entries.pop(key)[1]
+        if size > self.max_bytes:
+            return
+        self._entries[key] = (copy.deepcopy(value), size)
+        self.total_bytes += size
+        while len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.total_bytes -= evicted_size
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        self._entries.clear()
+        self.total_bytes = 0
@@ -2,41 +2,119 @@
 Pytest configuration and fixtures for backend tests.
 """
 import pytest
+import pytest_asyncio
+import asyncio
 import os
-import tempfile
-import shutil
-from datetime import date, datetime
-from typing import Generator
-from sqlalchemy import create_engine
+import json
+import uuid
+from io import BytesIO
+from datetime import date, datetime, timedelta
+from typing import AsyncGenerator, Callable, Generator, Optional, Tuple
+from sqlalchemy import create_engine, event, insert, select
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import StaticPool
+from fastapi import Depends, FastAPI
+from fastapi.security import HTTPAuthorizationCredentials
 from fastapi.testclient import TestClient
+from httpx import AsyncClient, ASGITransport, Response
 
+# Minimum bcrypt cost so hashing test passwords takes milliseconds; must be
+# set before the app's settings are loaded
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+from app.core.config import settings
 from app.core.database import Base, get_db
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash, create_user_token
+from app.api.checks import get_check_runner, run_document_check
+from app.api.deps import get_current_user, get_current_user_optional, optional_security, security
 from app.models import User, Check, CheckType, CheckStatus, CostType, RuleTemplate
 from main import app
-
-
-# Test database setup
-TEST_DATABASE_URL = "sqlite:///./test.db"
-engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread": False})
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+from tests.integration._helpers import docx_files, docx_text
+
+
+FILE_ID_POOL_SIZE = 32
+
+
+# Test database setup: a private in-memory SQLite database. StaticPool keeps
+# the single connection alive so the schema survives for the whole session
+# and the TestClient thread sees the same data as the test body. Under
+# pytest-xdist every worker gets its own named database.
+WORKER_ID = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+TEST_DATABASE_URL = f"sqlite:///file:memdb_{WORKER_ID}?mode=memory&cache=shared&uri=true"
+engine = create_engine(
+    TEST_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool,
+    # Room for every distinct statement the suite compiles, so none are
+    # evicted and recompiled between modules
+    query_cache_size=1200,
+)
+# Commits in tests only release a SAVEPOINT (see the db fixture), so there
+# is nothing to re-read afterwards; keep loaded attributes instead of
+# expiring them. Use db.refresh() when a value was changed behind the ORM.
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragma(dbapi_connection, connection_record):
+        """Trade durability for speed: the test database is throwaway."""
+        # Let SQLAlchemy emit BEGIN itself; pysqlite's implicit transactions
+        # break the SAVEPOINT handling the db fixture relies on.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA journal_mode=MEMORY")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _do_begin(connection):
+        connection.exec_driver_sql("BEGIN")
 
 
 @pytest.fixture(scope="session")
 def test_db_engine():
-    """Create test database engine."""
+    """Create test database engine (schema is created once per session)."""
     Base.metadata.create_all(bind=engine)
     yield engine
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(scope="session")
+def warm_statement_cache(test_db_engine) -> None:
+    """
+    Compile the Check lookups the revision tests repeat, once per session.
+
+    Mirrors the ORM statements the tests and the revise/download/result
+    endpoints issue, so their first use hits the engine's compiled cache.
+    """
+    session = TestingSessionLocal(bind=test_db_engine)
+    try:
+        session.scalar(select(Check).where(Check.check_id == "_warmup_"))
+        session.scalar(select(Check.revised_file_path).where(Check.check_id == "_warmup_"))
+        session.query(Check).filter(Check.check_id == "_warmup_", Check.user_id == 0).first()
+    finally:
+        session.close()
+
+
 @pytest.fixture(scope="function")
-def db(test_db_engine) -> Generator[Session, None, None]:
-    """Create a new database session for each test."""
+def db(test_db_engine, test_user_id: int, sample_rule_template_id: int) -> Generator[Session, None, None]:
+    """
+    Create a new database session for each test.
+
+    The session joins an outer transaction on a dedicated connection and
+    turns every commit (from the test or from API handlers sharing it) into
+    a SAVEPOINT release, so rolling back the outer transaction restores a
+    clean database without any DDL between tests.
+
+    Session-wide rows (the test user, the sample rule template) are
+    committed before the outer transaction opens: once it has, another
+    session can no longer begin a transaction on the shared connection.
+    """
     connection = test_db_engine.connect()
     transaction = connection.begin()
-    session = TestingSessionLocal(bind=connection)
+    session = TestingSessionLocal(bind=connection, join_transaction_mode="create_savepoint")
 
     yield session
 
@@ -45,9 +123,36 @@ def db(test_db_engine) -> Generator[Session, None, None]:
     connection.close()
 
 
+@pytest.fixture
+def query_log(test_db_engine) -> Generator[list, None, None]:
+    """Collect the SQL statements executed during the test (transaction control excluded)."""
+    statements = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if not statement.lstrip().upper().startswith(("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")):
+            statements.append(statement)
+
+    event.listen(test_db_engine, "before_cursor_execute", _record)
+    yield statements
+    event.remove(test_db_engine, "before_cursor_execute", _record)
+
+
+@pytest.fixture(scope="session", name="app")
+def app_fixture() -> FastAPI:
+    """The FastAPI application under test, built once at import time."""
+    return app
+
+
+@pytest.fixture(scope="session")
+def app_client(app: FastAPI) -> Generator[TestClient, None, None]:
+    """Create one test client (and run the app lifespan once) for the session."""
+    with TestClient(app) as test_client:
+        yield test_client
+
+
 @pytest.fixture(scope="function")
-def client(db: Session) -> Generator[TestClient, None, None]:
-    """Create a test client with database session override."""
+def client(app: FastAPI, app_client: TestClient, db: Session) -> Generator[TestClient, None, None]:
+    """Point the shared test client at this test's database session."""
     def override_get_db():
         try:
             yield db
@@ -55,27 +160,134 @@ def client(db: Session) -> Generator[TestClient, None, None]:
             pass
 
     app.dependency_overrides[get_db] = override_get_db
-    with TestClient(app) as test_client:
-        yield test_client
-    app.dependency_overrides.clear()
+    yield app_client
+    app.dependency_overrides.pop(get_db, None)
+
+
+@pytest.fixture(scope="session")
+def event_loop() -> Generator[asyncio.AbstractEventLoop, None, None]:
+    """Share one event loop across all async tests and fixtures."""
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest_asyncio.fixture(scope="session")
+async def app_async_client(app: FastAPI) -> AsyncGenerator[AsyncClient, None]:
+    """Create one in-process async client for the session (on the shared event loop)."""
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://testserver") as ac:
+        yield ac
+
+
+@pytest_asyncio.fixture
+async def async_client(app: FastAPI, app_async_client: AsyncClient, db: Session) -> AsyncGenerator[AsyncClient, None]:
+    """Point the shared async client at this test's database session."""
+    def override_get_db():
+        try:
+            yield db
+        finally:
+            pass
+
+    app.dependency_overrides[get_db] = override_get_db
+    yield app_async_client
+    app.dependency_overrides.pop(get_db, None)
 
 
 @pytest.fixture
-def test_user(db: Session) -> User:
-    """Create a test user."""
-    user = User(
-        username="testuser",
-        password_hash=get_password_hash("testpass123"),
-        nickname="Test User",
-        free_count=3,
-        basic_count=10,
-        full_count=5,
-        last_reset_date=date.today()
-    )
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+def current_user_on_loop(app: FastAPI, db: Session) -> Generator[None, None, None]:
+    """
+    Resolve the bearer token's user on the event loop instead of a worker thread.
+
+    For async tests that overlap requests: they all share this test's
+    session, which must not be used from several threadpool workers at once.
+    """
+    async def _current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> User:
+        return get_current_user(credentials, db)
+
+    async def _current_user_optional(
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+    ) -> Optional[User]:
+        return get_current_user_optional(credentials, db)
+
+    app.dependency_overrides[get_current_user] = _current_user
+    app.dependency_overrides[get_current_user_optional] = _current_user_optional
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+    app.dependency_overrides.pop(get_current_user_optional, None)
+
+
+@pytest.fixture
+def as_test_user(app: FastAPI, test_user: User) -> Generator[None, None, None]:
+    """
+    Authenticate every request as the test user without decoding a token.
+
+    For tests that exercise endpoints rather than auth: skips the JWT
+    decode and user lookup per request. Auth itself is covered by
+    test_auth_api.py with the real dependency.
+    """
+    async def _current_user() -> User:
+        return test_user
+
+    app.dependency_overrides[get_current_user] = _current_user
+    yield
+    app.dependency_overrides.pop(get_current_user, None)
+
+
+async def _fast_check_runner(file_path: str, check_type: str, rule_config, db: Session) -> dict:
+    """Stand-in for the check pipeline: same result shape, no parsing."""
+    return {"issues": [], "total_issues": 0, "check_type": check_type}
+
+
+@pytest.fixture(autouse=True)
+def stub_check_pipeline(request, app: FastAPI) -> Generator[None, None, None]:
+    """
+    Skip document parsing and rule checks unless the test is marked real_pipeline.
+
+    Most tests only assert on counts, history and records; tests that need
+    real issues (e.g. to revise a document) opt in with
+    @pytest.mark.real_pipeline.
+    """
+    if request.node.get_closest_marker("real_pipeline"):
+        yield
+        return
+
+    app.dependency_overrides[get_check_runner] = lambda: _fast_check_runner
+    yield
+    app.dependency_overrides.pop(get_check_runner, None)
+
+
+@pytest.fixture(scope="session")
+def test_user_id(test_db_engine) -> int:
+    """
+    Create the test user once per session and return its id.
+
+    The row is committed outside the per-test transaction, so it survives
+    every rollback; changes a test makes to it are still rolled back. The
+    db fixture depends on this one so the commit always happens before any
+    test transaction exists.
+    """
+    session = TestingSessionLocal(bind=test_db_engine)
+    try:
+        user = User(
+            username="testuser",
+            password_hash=get_password_hash("testpass123"),
+            nickname="Test User",
+            free_count=3,
+            basic_count=10,
+            full_count=5,
+            last_reset_date=date.today()
+        )
+        session.add(user)
+        session.commit()
+        return user.id
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def test_user(db: Session, test_user_id: int) -> User:
+    """Get the test user in this test's session."""
+    return db.get(User, test_user_id)
 
 
 @pytest.fixture
@@ -91,43 +303,58 @@ def guest_user(db: Session) -> User:
         last_reset_date=date.today()
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    db.flush()
     return user
 
 
-@pytest.fixture
-def auth_token(client: TestClient, test_user: User) -> str:
-    """Get authentication token for test user."""
-    response = client.post(
-        "/api/auth/login",
-        json={
-            "username": "testuser",
-            "password": "testpass123"
-        }
-    )
-    assert response.status_code == 200
-    data = response.json()
-    return data["data"]["access_token"]
+@pytest.fixture(scope="session")
+def auth_token(test_user_id: int) -> str:
+    """Get authentication token for test user (minted once per session)."""
+    return create_user_token(test_user_id, expires_delta=timedelta(hours=24))
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def auth_headers(auth_token: str) -> dict:
     """Get authentication headers with bearer token."""
     return {"Authorization": f"Bearer {auth_token}"}
 
 
 @pytest.fixture
-def temp_upload_dir() -> Generator[str, None, None]:
-    """Create a temporary upload directory."""
-    temp_dir = tempfile.mkdtemp()
-    yield temp_dir
-    shutil.rmtree(temp_dir, ignore_errors=True)
+def authed_headers(db: Session) -> dict:
+    """Authentication headers for a fresh user inserted directly (no register round-trip)."""
+    user_id = db.execute(insert(User).values(
+        username=f"authed_{uuid.uuid4().hex[:8]}",
+        password_hash="!",  # Never logs in; token is minted directly
+        nickname="Authed User",
+        last_reset_date=date.today()
+    )).inserted_primary_key[0]
+    return {"Authorization": f"Bearer {create_user_token(user_id)}"}
+
+
+@pytest.fixture(scope="session", autouse=True)
+def upload_dir(tmp_path_factory) -> Generator[str, None, None]:
+    """Send uploads and revised documents to a per-session (per-worker) directory."""
+    original_upload_dir = settings.UPLOAD_DIR
+    settings.UPLOAD_DIR = str(tmp_path_factory.mktemp("uploads"))
+    yield settings.UPLOAD_DIR
+    settings.UPLOAD_DIR = original_upload_dir
 
 
 @pytest.fixture
-def sample_docx_path(temp_upload_dir: str) -> str:
-    """Create a sample .docx file for testing."""
+def temp_upload_dir(tmp_path) -> str:
+    """Create a temporary upload directory."""
+    return str(tmp_path)
+
+
+@pytest.fixture(scope="session")
+def docx_fixture_dir(tmp_path_factory) -> str:
+    """Session-wide directory for generated .docx fixtures (treat as read-only)."""
+    return str(tmp_path_factory.mktemp("docx"))
+
+
+@pytest.fixture(scope="session")
+def sample_docx_path(docx_fixture_dir: str) -> str:
+    """Create a sample .docx file once per session."""
     from docx import Document
 
     doc = Document()
@@ -136,11 +363,207 @@ def sample_docx_path(temp_upload_dir: str) -> str:
     doc.add_heading('Section 1', level=1)
     doc.add_paragraph('This is section 1 content.')
 
-    file_path = os.path.join(temp_upload_dir, "test_document.docx")
+    file_path = os.path.join(docx_fixture_dir, "test_document.docx")
+    doc.save(file_path)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def sample_docx_bytes(sample_docx_path: str) -> bytes:
+    """Contents of the sample .docx, read once per session for in-memory uploads."""
+    with open(sample_docx_path, "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="session")
+def sample_docx_paragraphs_text(sample_docx_path: str) -> str:
+    """Paragraph text of the sample .docx, one paragraph per line, parsed once per session."""
+    return docx_text(sample_docx_path)
+
+
+@pytest.fixture(scope="session")
+def large_docx_path(docx_fixture_dir: str) -> str:
+    """Create a large (10,000 paragraph) .docx file once per session."""
+    from docx import Document
+
+    doc = Document()
+    for i in range(10000):
+        doc.add_paragraph(f"This is paragraph {i} with some content to make the file larger.")
+
+    file_path = os.path.join(docx_fixture_dir, "large.docx")
     doc.save(file_path)
     return file_path
 
 
+@pytest.fixture(scope="session")
+def margin_docx_bytes() -> bytes:
+    """A .docx with 10mm page margins all round (a fixable issue), built once per session."""
+    from docx import Document
+    from docx.shared import Mm
+
+    doc = Document()
+    section = doc.sections[0]
+    section.top_margin = Mm(10)
+    section.bottom_margin = Mm(10)
+    section.left_margin = Mm(10)
+    section.right_margin = Mm(10)
+    doc.add_paragraph("Test content")
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture(scope="session")
+def sample_format_docx_bytes() -> bytes:
+    """A .docx with set margins, two heading levels and a styled body paragraph, built once per session."""
+    from docx import Document
+    from docx.shared import Mm, Pt
+
+    doc = Document()
+
+    # Set page margins
+    section = doc.sections[0]
+    section.top_margin = Mm(25)
+    section.bottom_margin = Mm(25)
+    section.left_margin = Mm(32)
+    section.right_margin = Mm(25)
+
+    # Add headings with different styles
+    heading1 = doc.add_heading('第一章 绪论', 1)
+    heading1.alignment = 0  # Center (not working in test, but structure is there)
+
+    doc.add_heading('第一节 研究背景', 2)
+
+    # Add body paragraph
+    para = doc.add_paragraph('这是正文内容，用于测试格式提取功能。')
+    para.runs[0].font.name = '宋体'
+    para.runs[0].font.size = Pt(14)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def upload_docx(client: TestClient, auth_headers: dict, sample_docx_bytes: bytes) -> Callable[..., str]:
+    """Return a callable that uploads the sample document and returns the new file_id."""
+    def _upload(filename: str = "test.docx", check_type: str = "basic") -> str:
+        response = client.post(
+            "/api/check/upload",
+            headers=auth_headers,
+            files=docx_files(filename, BytesIO(sample_docx_bytes)),
+            data={"check_type": check_type}
+        )
+        assert response.status_code == 200
+        return response.json()["data"]["file_id"]
+
+    return _upload
+
+
+@pytest.fixture
+def submit_check(client: TestClient, auth_headers: dict) -> Callable[..., Response]:
+    """Return a callable that submits a check for the test user."""
+    def _submit(file_id: str, check_type: str = "basic", filename: str = "test.docx") -> Response:
+        return client.post(
+            "/api/check",
+            headers=auth_headers,
+            json={
+                "file_id": file_id,
+                "filename": filename,
+                "check_type": check_type
+            }
+        )
+
+    return _submit
+
+
+@pytest.fixture
+def uploaded_file_id(upload_docx: Callable[..., str]) -> str:
+    """Upload the sample document for the test user and return its file_id."""
+    return upload_docx()
+
+
+def _stage_upload(user_id: int, content: bytes, filename: str = "test.docx") -> Tuple[str, str]:
+    """Write a document where /api/check/upload would store it; returns (file_id, file_path)."""
+    file_id = f"file_{uuid.uuid4().hex[:16]}"
+    user_upload_dir = os.path.join(settings.UPLOAD_DIR, str(user_id))
+    os.makedirs(user_upload_dir, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    file_path = os.path.join(user_upload_dir, f"{timestamp}_{file_id}_{filename}")
+    with open(file_path, "wb") as f:
+        f.write(content)
+    return file_id, file_path
+
+
+@pytest.fixture(scope="session")
+def shared_file_id(test_user_id: int, sample_docx_bytes: bytes) -> str:
+    """
+    Stage the sample document for the test user once per session.
+
+    Submitting a check does not consume the upload, so tests that only look
+    at the bookkeeping can share it. Tests that revise the document should
+    use uploaded_file_id, since revised files are written next to the upload.
+    """
+    file_id, _ = _stage_upload(test_user_id, sample_docx_bytes)
+    return file_id
+
+
+@pytest.fixture(scope="session")
+def file_id_pool(test_user_id: int, sample_docx_bytes: bytes) -> list:
+    """
+    Sample documents pre-staged for the test user, without HTTP uploads.
+
+    Tests that need distinct files take them with file_id_pool.pop().
+    """
+    return [_stage_upload(test_user_id, sample_docx_bytes, f"pool_{i}.docx")[0] for i in range(FILE_ID_POOL_SIZE)]
+
+
+@pytest.fixture(scope="module")
+def checked_sample_doc(test_user_id: int, sample_docx_bytes: bytes) -> dict:
+    """
+    Stage the sample document for the test user once per module.
+
+    Also holds the document's pipeline result, which uploaded_checked_doc
+    fills in on first use and reuses for the rest of the module.
+    """
+    file_id, file_path = _stage_upload(test_user_id, sample_docx_bytes)
+    return {"file_id": file_id, "file_path": file_path, "result_json": None}
+
+
+@pytest.fixture
+def uploaded_checked_doc(db: Session, test_user_id: int, checked_sample_doc: dict, event_loop) -> dict:
+    """
+    A completed check of the sample document, owned by the test user.
+
+    The real pipeline runs once per module, through this test's session.
+    Each test gets its own Check row, flushed inside its transaction and
+    rolled back with it, so tests may revise it or rewrite result_json.
+
+    Returns:
+        {"check_id", "file_id"}
+    """
+    doc = checked_sample_doc
+    if doc["result_json"] is None:
+        result = event_loop.run_until_complete(run_document_check(doc["file_path"], "basic", None, db))
+        doc["result_json"] = json.dumps(result, ensure_ascii=False)
+
+    check_id = f"check_{uuid.uuid4().hex[:16]}"
+    db.add(Check(
+        check_id=check_id,
+        user_id=test_user_id,
+        file_id=doc["file_id"],
+        filename="test.docx",
+        file_path=doc["file_path"],
+        check_type=CheckType.BASIC,
+        status=CheckStatus.COMPLETED,
+        cost_type=CostType.FREE,
+        result_json=doc["result_json"]
+    ))
+    db.flush()
+    return {"check_id": check_id, "file_id": doc["file_id"]}
+
+
 @pytest.fixture
 def sample_doc_data() -> dict:
     """Create sample parsed document data."""
@@ -266,47 +689,106 @@ def sample_rules() -> list:
     ]
 
 
-@pytest.fixture
-def sample_rule_template(db: Session, test_user: User) -> RuleTemplate:
-    """Create a sample rule template."""
+@pytest.fixture(scope="session")
+def sample_rule_template_id(test_db_engine) -> int:
+    """
+    Create the sample rule template once per session and return its id.
+
+    Committed through its own session, so it must run before any test
+    transaction exists; the db fixture depends on it for that reason.
+    """
     from app.models.rule_template import TemplateType
-    template = RuleTemplate(
-        name="测试模板",
-        description="用于测试的规则模板",
-        template_type=TemplateType.SYSTEM,
-        user_id=None,  # System template has no user
-        is_default=True,
-        config_json={
-            "page": {
-                "margins": {
-                    "top_cm": 2.5,
-                    "bottom_cm": 2.5,
-                    "left_cm": 3.0,
-                    "right_cm": 2.5
+    session = TestingSessionLocal(bind=test_db_engine)
+    try:
+        template = RuleTemplate(
+            name="测试模板",
+            description="用于测试的规则模板",
+            template_type=TemplateType.SYSTEM,
+            user_id=None,  # System template has no user
+            is_default=True,
+            config_json={
+                "page": {
+                    "margins": {
+                        "top_cm": 2.5,
+                        "bottom_cm": 2.5,
+                        "left_cm": 3.0,
+                        "right_cm": 2.5
+                    },
+                    "paper_name": "A4"
                 },
-                "paper_name": "A4"
-            },
-            "body": {
-                "font": "SimSun",
-                "size_pt": 14,
-                "line_spacing_pt": 28,
-                "first_line_indent_chars": 2
-            },
-            "headings": [
-                {
-                    "level": 1,
-                    "font": "SimHei",
-                    "size_pt": 18,
-                    "bold": True,
-                    "alignment": "center"
-                }
-            ]
-        }
+                "body": {
+                    "font": "SimSun",
+                    "size_pt": 14,
+                    "line_spacing_pt": 28,
+                    "first_line_indent_chars": 2
+                },
+                "headings": [
+                    {
+                        "level": 1,
+                        "font": "SimHei",
+                        "size_pt": 18,
+                        "bold": True,
+                        "alignment": "center"
+                    }
+                ]
+            }
+        )
+        session.add(template)
+        session.commit()
+        return template.id
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def sample_rule_template(db: Session, sample_rule_template_id: int) -> RuleTemplate:
+    """Get the sample rule template in this test's session."""
+    return db.get(RuleTemplate, sample_rule_template_id)
+
+
+@pytest.fixture(scope="session")
+def default_password_hash() -> str:
+    """bcrypt hash of "password", computed once per session."""
+    return get_password_hash("password")
+
+
+@pytest.fixture
+def other_user(db: Session, default_password_hash: str) -> User:
+    """A second registered user (password "password"), for ownership checks."""
+    user = User(
+        username="other_user",
+        password_hash=default_password_hash,
+        nickname="Other"
     )
-    db.add(template)
-    db.commit()
-    db.refresh(template)
-    return template
+    db.add(user)
+    db.flush()
+    return user
+
+
+@pytest.fixture
+def custom_template_factory(db: Session, test_user: User) -> Callable[..., RuleTemplate]:
+    """
+    Return a function that adds a custom rule template for the test user.
+
+    Keyword arguments override the RuleTemplate columns (e.g. name,
+    user_id). Rows are flushed, not committed, and roll back with the test.
+    """
+    from app.models.rule_template import TemplateType
+
+    def _make(**overrides) -> RuleTemplate:
+        values = {
+            "name": "Custom Template",
+            "template_type": TemplateType.CUSTOM,
+            "user_id": test_user.id,
+            "config_json": {},
+            **overrides,
+        }
+        template = RuleTemplate(**values)
+        db.add(template)
+        db.flush()
+        return template
+
+    return _make
 
 
 @pytest.fixture
@@ -324,6 +806,5 @@ def sample_check(db: Session, test_user: User, sample_docx_path: str) -> Check:
         result_json='{"total_issues": 2, "issues": []}'
     )
     db.add(check)
-    db.commit()
-    db.refresh(check)
+    db.flush()
     return check
@@ -26,6 +26,7 @@ TEST_PATH="tests/"
 MARKERS=""
 VERBOSE="-v"
 COVERAGE="--cov=app --cov-report=html --cov-report=term-missing"
+PARALLEL=""
 
 while [[ $# -gt 0 ]]; do
     case $1 in
@@ -58,6 +59,10 @@ while [[ $# -gt 0 ]]; do
             VERBOSE=""
             shift
             ;;
+        --parallel)
+            PARALLEL="-n auto --dist=loadfile"
+            shift
+            ;;
         *)
             TEST_PATH="$1"
             shift
@@ -72,7 +77,7 @@ fi
 echo ""
 
 # Run tests
-pytest $TEST_PATH $MARKERS $VERBOSE $COVERAGE
+pytest $TEST_PATH $MARKERS $VERBOSE $COVERAGE $PARALLEL
 
 # Check exit code
 EXIT_CODE=$?
@@ -3,7 +3,7 @@ Database migration script for upgrading to the latest version.
 
 This script:
 1. Creates rule_templates table if not exists
-2. Adds rule_template_id and rule_config_json columns to checks table if not exists
+2. Adds rule_template_id, rule_config_json and revised_result_hash columns to checks table if not exists
 3. Adds last_template_id column to users table if not exists
 4. Seeds system rule templates
 
@@ -54,8 +54,9 @@ def migrate_checks_table(engine):
     # Check if columns exist
     has_rule_template_id = check_column_exists(engine, 'checks', 'rule_template_id')
     has_rule_config_json = check_column_exists(engine, 'checks', 'rule_config_json')
+    has_revised_result_hash = check_column_exists(engine, 'checks', 'revised_result_hash')
 
-    if has_rule_template_id and has_rule_config_json:
+    if has_rule_template_id and has_rule_config_json and has_revised_result_hash:
         print("✓ checks table already has required columns")
         return
 
@@ -91,6 +92,17 @@ def migrate_checks_table(engine):
             conn.commit()
             print("    ✓ rule_config_json column added")
 
+        # Add revised_result_hash column
+        if not has_revised_result_hash:
+            print("  - Adding revised_result_hash column...")
+            conn.execute(text("""
+                ALTER TABLE checks
+                ADD COLUMN revised_result_hash VARCHAR(64) NULL
+                COMMENT '生成修订版时检查结果的SHA-256'
+            """))
+            conn.commit()
+            print("    ✓ revised_result_hash column added")
+
     print("✓ checks table migration completed")
 
 
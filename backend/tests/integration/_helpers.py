@@ -0,0 +1,195 @@
+"""
+Shared steps for the end-to-end workflow tests.
+
+Each helper issues the same requests the frontend does (register, upload,
+submit check) so tests only spell out the steps they assert on.
+"""
+import os
+import uuid
+import zipfile
+from datetime import date
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+import orjson
+from lxml import etree
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from app.core.security import create_user_token
+from app.models import Check, CheckStatus, CheckType, CostType, User
+
+
+DOCX_MIME = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+UPLOAD_BOUNDARY = "doc-helper-test-boundary"
+W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def docx_files(name: str, f) -> dict:
+    """Multipart `files` payload for uploading a .docx."""
+    return {"file": (name, f, DOCX_MIME)}
+
+
+@lru_cache(maxsize=32)
+def docx_upload_body(filename: str, docx_bytes: bytes, check_type: str = "basic") -> Tuple[bytes, str]:
+    """
+    Encode the /api/check/upload multipart body once per distinct upload.
+
+    Returns:
+        (body, content_type) to send with `content=` and a Content-Type header
+    """
+    boundary = UPLOAD_BOUNDARY.encode()
+    body = b"".join([
+        b"--", boundary, b"\r\n",
+        b'Content-Disposition: form-data; name="check_type"\r\n\r\n',
+        check_type.encode(), b"\r\n",
+        b"--", boundary, b"\r\n",
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'.encode(),
+        f"Content-Type: {DOCX_MIME}\r\n\r\n".encode(),
+        docx_bytes, b"\r\n",
+        b"--", boundary, b"--\r\n",
+    ])
+    return body, f"multipart/form-data; boundary={UPLOAD_BOUNDARY}"
+
+
+def docx_text(source) -> str:
+    """
+    Paragraph text of a .docx, one paragraph per line.
+
+    Streams word/document.xml with lxml instead of building python-docx
+    proxy objects. Unlike Document.paragraphs this also yields paragraphs
+    nested in tables.
+
+    Args:
+        source: Path or binary file-like object
+    """
+    lines = []
+    with zipfile.ZipFile(source) as archive, archive.open("word/document.xml") as xml:
+        for _, paragraph in etree.iterparse(xml, events=("end",), tag=f"{W_NS}p"):
+            lines.append("".join(t.text or "" for t in paragraph.iter(f"{W_NS}t")))
+            paragraph.clear()
+    return "\n".join(lines)
+
+
+def _upload_request(headers: dict, docx_bytes: bytes, filename: str, check_type: str) -> dict:
+    """Keyword arguments for POSTing a pre-encoded upload."""
+    body, content_type = docx_upload_body(filename, docx_bytes, check_type)
+    return {"content": body, "headers": {**headers, "Content-Type": content_type}}
+
+
+def register_user(client, username: str, password: str = "pass123", nickname: Optional[str] = None) -> dict:
+    """
+    Register a user through the API.
+
+    Returns:
+        Dict with the registration "data", "token", "headers" and "user_id"
+    """
+    response = client.post("/api/auth/register", json={
+        "username": username, "password": password, "nickname": nickname or username
+    })
+    assert response.status_code == 200
+    data = response.json()["data"]
+    return {
+        "data": data,
+        "token": data["access_token"],
+        "headers": {"Authorization": f"Bearer {data['access_token']}"},
+        "user_id": data["user"]["id"],
+    }
+
+
+def make_user(db: Session, username: str, **fields) -> dict:
+    """
+    Insert a user directly and mint its token, skipping /api/auth/register.
+
+    Args:
+        fields: User column values, e.g. free_count=1, basic_count=2
+
+    Returns:
+        Dict with "token", "headers" and "user_id", like register_user()
+    """
+    values = {
+        "username": username,
+        "password_hash": "!",  # Never logs in; token is minted directly
+        "nickname": username,
+        "last_reset_date": date.today(),  # Don't let the monthly reset overwrite free_count
+        **fields,
+    }
+    user_id = db.execute(insert(User).values(**values)).inserted_primary_key[0]
+    token = create_user_token(user_id)
+    return {"token": token, "headers": {"Authorization": f"Bearer {token}"}, "user_id": user_id}
+
+
+def assert_revision_complete(db: Session, check_id: str) -> str:
+    """Assert the check has a revised document saved as a regular file; returns its path."""
+    path = db.scalar(select(Check.revised_file_path).where(Check.check_id == check_id))
+    assert path and os.path.isfile(path)
+    return path
+
+
+def make_completed_check(db: Session, user_id: int, file_path: str, result: dict) -> Check:
+    """
+    Insert a completed basic check with the given stored result, skipping upload and check.
+
+    Args:
+        file_path: Document the check (and any revision) reads
+        result: Stored as the check's result_json
+    """
+    check = Check(
+        check_id=f"check_{uuid.uuid4().hex[:16]}",
+        user_id=user_id,
+        file_id=f"file_{uuid.uuid4().hex[:16]}",
+        filename="test.docx",
+        file_path=file_path,
+        check_type=CheckType.BASIC,
+        status=CheckStatus.COMPLETED,
+        cost_type=CostType.FREE,
+        result_json=orjson.dumps(result).decode("utf-8")
+    )
+    db.add(check)
+    db.flush()
+    return check
+
+
+def upload_and_check(client, headers: dict, docx_bytes: bytes, *, filename: str = "test.docx",
+                     check_type: str = "basic", template_id: Optional[int] = None):
+    """Upload a .docx and submit a check for it; returns the check response."""
+    upload = client.post("/api/check/upload", **_upload_request(headers, docx_bytes, filename, check_type))
+    assert upload.status_code == 200
+    payload = {"file_id": upload.json()["data"]["file_id"], "filename": filename, "check_type": check_type}
+    if template_id is not None:
+        payload["rule_template_id"] = template_id
+    return client.post("/api/check", headers=headers, json=payload)
+
+
+async def upload_and_check_async(client, headers: dict, docx_bytes: bytes, *, filename: str = "test.docx",
+                                 check_type: str = "basic"):
+    """Async variant of upload_and_check for an httpx.AsyncClient."""
+    upload = await client.post("/api/check/upload", **_upload_request(headers, docx_bytes, filename, check_type))
+    payload = {"file_id": upload.json()["data"]["file_id"], "filename": filename, "check_type": check_type}
+    return await client.post("/api/check", headers=headers, json=payload)
+
+
+def run_basic_flow(client, username: str, *, docx_bytes: bytes, check_type: str = "basic",
+                   template_id: Optional[int] = None, seed_counts: Optional[Dict[str, int]] = None,
+                   db: Optional[Session] = None) -> dict:
+    """
+    Get a user, then upload and check one document as them.
+
+    The user is registered through the API, or inserted with make_user()
+    when seed_counts are given.
+
+    Args:
+        seed_counts: e.g. {"free": 0, "basic": 2}; requires `db`
+
+    Returns:
+        The register_user()/make_user() dict plus "response", "check_id" and "file_id"
+    """
+    if seed_counts:
+        user = make_user(db, username, **{f"{name}_count": value for name, value in seed_counts.items()})
+    else:
+        user = register_user(client, username)
+
+    response = upload_and_check(client, user["headers"], docx_bytes,
+                                check_type=check_type, template_id=template_id)
+    data = response.json()["data"] or {}
+    return {**user, "response": response, "check_id": data.get("check_id"), "file_id": data.get("file_id")}
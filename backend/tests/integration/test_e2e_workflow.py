@@ -5,11 +5,20 @@ Tests the complete user journey from registration to document checking
 and revision, ensuring all components work together correctly.
 """
 import pytest
-import os
-import json
+import asyncio
+from io import BytesIO
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from docx import Document
-from app.models import User, Check, CheckStatus, CheckType, CostType
+from app.models import User, CheckType, CostType
+from tests.integration._helpers import (
+    assert_revision_complete,
+    docx_files,
+    register_user,
+    run_basic_flow,
+    upload_and_check,
+    upload_and_check_async,
+)
 
 
 @pytest.mark.integration
@@ -17,26 +26,13 @@ from app.models import User, Check, CheckStatus, CheckType, CostType
 class TestEndToEndWorkflow:
     """End-to-end test cases for complete user workflows."""
 
-    def test_complete_new_user_workflow(self, client, db: Session, sample_docx_path):
+    def test_complete_new_user_workflow(self, client, db: Session, sample_docx_bytes):
         """Test complete workflow for a new user: register -> check -> revise -> download."""
         # Step 1: Register new user
-        register_response = client.post(
-            "/api/auth/register",
-            json={
-                "username": "newuser123",
-                "password": "password123",
-                "nickname": "New User"
-            }
-        )
-
-        assert register_response.status_code == 200
-        register_data = register_response.json()
-        assert register_data["code"] == 200
-        assert "access_token" in register_data["data"]
-        assert register_data["data"]["user"]["free_count"] == 3
-
-        token = register_data["data"]["access_token"]
-        auth_headers = {"Authorization": f"Bearer {token}"}
+        user = register_user(client, "newuser123", password="password123", nickname="New User")
+        assert "access_token" in user["data"]
+        assert user["data"]["user"]["free_count"] == 3
+        auth_headers = user["headers"]
 
         # Step 2: Get initial profile
         profile_response = client.get("/api/auth/user/profile", headers=auth_headers)
@@ -45,13 +41,12 @@ class TestEndToEndWorkflow:
         assert initial_profile["free_count"] == 3
 
         # Step 3: Upload document
-        with open(sample_docx_path, "rb") as f:
-            upload_response = client.post(
-                "/api/check/upload",
-                headers=auth_headers,
-                files={"file": ("test.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                data={"check_type": "basic"}
-            )
+        upload_response = client.post(
+            "/api/check/upload",
+            headers=auth_headers,
+            files=docx_files("test.docx", BytesIO(sample_docx_bytes)),
+            data={"check_type": "basic"}
+        )
 
         assert upload_response.status_code == 200
         file_id = upload_response.json()["data"]["file_id"]
@@ -73,9 +68,7 @@ class TestEndToEndWorkflow:
         check_id = check_data["data"]["check_id"]
 
         # Step 5: Verify count deducted
-        profile_response = client.get("/api/auth/user/profile", headers=auth_headers)
-        updated_profile = profile_response.json()["data"]
-        assert updated_profile["free_count"] == 2
+        assert check_data["data"]["remaining_counts"]["free"] == 2
 
         # Step 6: Get check result
         result_response = client.get(f"/api/check/{check_id}", headers=auth_headers)
@@ -100,129 +93,50 @@ class TestEndToEndWorkflow:
         assert history_data["total"] == 1
         assert len(history_data["checks"]) == 1
 
-    def test_user_exhausts_free_count_then_uses_basic(self, client, db: Session, sample_docx_path):
+    def test_user_exhausts_free_count_then_uses_basic(self, client, db: Session, sample_docx_bytes):
         """Test workflow where user exhausts free count and then uses basic count."""
-        # Register user
-        register_response = client.post(
-            "/api/auth/register",
-            json={
-                "username": "testuser_exhaust",
-                "password": "password123",
-                "nickname": "Test User"
-            }
-        )
-
-        token = register_response.json()["data"]["access_token"]
-        auth_headers = {"Authorization": f"Bearer {token}"}
-        user_id = register_response.json()["data"]["user"]["id"]
-
-        # Give user 1 free count and 2 basic counts
-        user = db.query(User).filter(User.id == user_id).first()
-        user.free_count = 1
-        user.basic_count = 2
-        db.commit()
-
-        # First check: uses free count
-        with open(sample_docx_path, "rb") as f:
-            upload1 = client.post("/api/check/upload", headers=auth_headers,
-                files={"file": ("test1.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                data={"check_type": "basic"})
-        file_id1 = upload1.json()["data"]["file_id"]
-        check1 = client.post("/api/check", headers=auth_headers,
-            json={"file_id": file_id1, "filename": "test1.docx", "check_type": "basic"})
-        assert check1.status_code == 200
-        check1_id = check1.json()["data"]["check_id"]
+        # Register with 1 free count and 2 basic counts; first check uses free count
+        flow = run_basic_flow(client, "testuser_exhaust", docx_bytes=sample_docx_bytes,
+                              seed_counts={"free": 1, "basic": 2}, db=db)
+        auth_headers = flow["headers"]
+        assert flow["response"].status_code == 200
+        assert flow["response"].json()["data"]["cost_type"] == CostType.FREE.value
 
         # Verify free count used
-        profile1 = client.get("/api/auth/user/profile", headers=auth_headers).json()["data"]
-        assert profile1["free_count"] == 0
-        assert profile1["basic_count"] == 2
-
-        check1_record = db.query(Check).filter(Check.check_id == check1_id).first()
-        assert check1_record.cost_type == CostType.FREE
+        remaining1 = flow["response"].json()["data"]["remaining_counts"]
+        assert remaining1["free"] == 0
+        assert remaining1["basic"] == 2
 
         # Second check: uses basic count
-        with open(sample_docx_path, "rb") as f:
-            upload2 = client.post("/api/check/upload", headers=auth_headers,
-                files={"file": ("test2.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                data={"check_type": "basic"})
-        file_id2 = upload2.json()["data"]["file_id"]
-        check2 = client.post("/api/check", headers=auth_headers,
-            json={"file_id": file_id2, "filename": "test2.docx", "check_type": "basic"})
+        check2 = upload_and_check(client, auth_headers, sample_docx_bytes, filename="test2.docx")
         assert check2.status_code == 200
-        check2_id = check2.json()["data"]["check_id"]
+        assert check2.json()["data"]["cost_type"] == CostType.BASIC.value
 
         # Verify basic count used
-        profile2 = client.get("/api/auth/user/profile", headers=auth_headers).json()["data"]
-        assert profile2["free_count"] == 0
-        assert profile2["basic_count"] == 1
-
-        check2_record = db.query(Check).filter(Check.check_id == check2_id).first()
-        assert check2_record.cost_type == CostType.BASIC
+        remaining2 = check2.json()["data"]["remaining_counts"]
+        assert remaining2["free"] == 0
+        assert remaining2["basic"] == 1
 
         # Third check: uses basic count again
-        with open(sample_docx_path, "rb") as f:
-            upload3 = client.post("/api/check/upload", headers=auth_headers,
-                files={"file": ("test3.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                data={"check_type": "basic"})
-        file_id3 = upload3.json()["data"]["file_id"]
-        check3 = client.post("/api/check", headers=auth_headers,
-            json={"file_id": file_id3, "filename": "test3.docx", "check_type": "basic"})
+        check3 = upload_and_check(client, auth_headers, sample_docx_bytes, filename="test3.docx")
         assert check3.status_code == 200
 
-        # Verify last basic count used
+        # Verify last basic count used (the profile agrees with the check response)
+        remaining3 = check3.json()["data"]["remaining_counts"]
         profile3 = client.get("/api/auth/user/profile", headers=auth_headers).json()["data"]
-        assert profile3["free_count"] == 0
-        assert profile3["basic_count"] == 0
+        assert remaining3["free"] == profile3["free_count"] == 0
+        assert remaining3["basic"] == profile3["basic_count"] == 0
 
         # Fourth check: should fail
-        with open(sample_docx_path, "rb") as f:
-            upload4 = client.post("/api/check/upload", headers=auth_headers,
-                files={"file": ("test4.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                data={"check_type": "basic"})
-        file_id4 = upload4.json()["data"]["file_id"]
-        check4 = client.post("/api/check", headers=auth_headers,
-            json={"file_id": file_id4, "filename": "test4.docx", "check_type": "basic"})
+        check4 = upload_and_check(client, auth_headers, sample_docx_bytes, filename="test4.docx")
         assert check4.status_code == 403
 
-    def test_check_with_template_and_revision(self, client, db: Session, sample_docx_path, sample_rule_template):
+    def test_check_with_template_and_revision(self, client, db: Session, authed_headers, sample_docx_bytes,
+                                              sample_rule_template):
         """Test complete workflow with custom rule template and revision."""
-        # Register user
-        register_response = client.post(
-            "/api/auth/register",
-            json={
-                "username": "template_user",
-                "password": "password123",
-                "nickname": "Template User"
-            }
-        )
-
-        token = register_response.json()["data"]["access_token"]
-        auth_headers = {"Authorization": f"Bearer {token}"}
-
-        # Upload document
-        with open(sample_docx_path, "rb") as f:
-            upload_response = client.post(
-                "/api/check/upload",
-                headers=auth_headers,
-                files={"file": ("test.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                data={"check_type": "basic"}
-            )
-
-        file_id = upload_response.json()["data"]["file_id"]
-
-        # Submit check with template
-        check_response = client.post(
-            "/api/check",
-            headers=auth_headers,
-            json={
-                "file_id": file_id,
-                "filename": "test.docx",
-                "check_type": "basic",
-                "rule_template_id": sample_rule_template.id
-            }
-        )
-
+        auth_headers = authed_headers
+        check_response = upload_and_check(client, auth_headers, sample_docx_bytes,
+                                          template_id=sample_rule_template.id)
         assert check_response.status_code == 200
         check_id = check_response.json()["data"]["check_id"]
 
@@ -243,156 +157,91 @@ class TestEndToEndWorkflow:
         download_response = client.get(f"/api/check/{check_id}/download_revised")
         assert download_response.status_code == 200
 
-    def test_multiple_users_independent_counts(self, client, db: Session, sample_docx_path):
+    @pytest.mark.asyncio
+    @pytest.mark.usefixtures("current_user_on_loop")
+    async def test_multiple_users_independent_counts(self, async_client, db: Session, sample_docx_bytes):
         """Test that multiple users have independent count management."""
-        # Register first user
-        register1 = client.post("/api/auth/register", json={
-            "username": "user1", "password": "pass123", "nickname": "User 1"
-        })
-        token1 = register1.json()["data"]["access_token"]
-        headers1 = {"Authorization": f"Bearer {token1}"}
-
-        # Register second user
-        register2 = client.post("/api/auth/register", json={
-            "username": "user2", "password": "pass123", "nickname": "User 2"
-        })
-        token2 = register2.json()["data"]["access_token"]
-        headers2 = {"Authorization": f"Bearer {token2}"}
-
-        # User 1 submits check
-        with open(sample_docx_path, "rb") as f:
-            upload1 = client.post("/api/check/upload", headers=headers1,
-                files={"file": ("test.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                data={"check_type": "basic"})
-        file_id1 = upload1.json()["data"]["file_id"]
-        client.post("/api/check", headers=headers1,
-            json={"file_id": file_id1, "filename": "test.docx", "check_type": "basic"})
-
-        # User 2 submits check
-        with open(sample_docx_path, "rb") as f:
-            upload2 = client.post("/api/check/upload", headers=headers2,
-                files={"file": ("test.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                data={"check_type": "basic"})
-        file_id2 = upload2.json()["data"]["file_id"]
-        client.post("/api/check", headers=headers2,
-            json={"file_id": file_id2, "filename": "test.docx", "check_type": "basic"})
+        # Register both users (sync endpoint, so one at a time)
+        headers = []
+        for username, nickname in [("user1", "User 1"), ("user2", "User 2")]:
+            register = await async_client.post("/api/auth/register", json={
+                "username": username, "password": "pass123", "nickname": nickname
+            })
+            headers.append({"Authorization": f"Bearer {register.json()['data']['access_token']}"})
+        headers1, headers2 = headers
+
+        # Each user uploads and submits a check; the two flows overlap
+        check1, check2 = await asyncio.gather(
+            upload_and_check_async(async_client, headers1, sample_docx_bytes),
+            upload_and_check_async(async_client, headers2, sample_docx_bytes),
+        )
+        assert check1.json()["code"] == 200
+        assert check2.json()["code"] == 200
 
         # Verify independent counts
-        profile1 = client.get("/api/auth/user/profile", headers=headers1).json()["data"]
-        profile2 = client.get("/api/auth/user/profile", headers=headers2).json()["data"]
-
-        assert profile1["free_count"] == 2
-        assert profile2["free_count"] == 2
+        assert check1.json()["data"]["remaining_counts"]["free"] == 2
+        assert check2.json()["data"]["remaining_counts"]["free"] == 2
 
         # Verify users can't access each other's checks
-        checks1 = client.get("/api/check/recent", headers=headers1).json()["data"]
-        checks2 = client.get("/api/check/recent", headers=headers2).json()["data"]
+        checks1 = (await async_client.get("/api/check/recent", headers=headers1)).json()["data"]
+        checks2 = (await async_client.get("/api/check/recent", headers=headers2)).json()["data"]
 
         assert checks1["total"] == 1
         assert checks2["total"] == 1
 
-    def test_full_check_workflow(self, client, db: Session, sample_docx_path):
-        """Test complete workflow for full check type."""
-        # Register user
-        register_response = client.post("/api/auth/register", json={
-            "username": "fullcheck_user", "password": "pass123", "nickname": "Full User"
-        })
-        token = register_response.json()["data"]["access_token"]
-        headers = {"Authorization": f"Bearer {token}"}
-        user_id = register_response.json()["data"]["user"]["id"]
-
-        # Give user full check count
-        user = db.query(User).filter(User.id == user_id).first()
-        user.full_count = 2
-        db.commit()
-
-        # Submit full check
-        with open(sample_docx_path, "rb") as f:
-            upload = client.post("/api/check/upload", headers=headers,
-                files={"file": ("test.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                data={"check_type": "full"})
-        file_id = upload.json()["data"]["file_id"]
-
-        check = client.post("/api/check", headers=headers,
-            json={"file_id": file_id, "filename": "test.docx", "check_type": "full"})
-        assert check.status_code == 200
-        check_id = check.json()["data"]["check_id"]
-
-        # Verify full count deducted
-        profile = client.get("/api/auth/user/profile", headers=headers).json()["data"]
-        assert profile["full_count"] == 1
-        assert profile["free_count"] == 3  # Free count unchanged
-
-        # Verify check type
-        check_record = db.query(Check).filter(Check.check_id == check_id).first()
-        assert check_record.check_type == CheckType.FULL
-        assert check_record.cost_type == CostType.FULL
+    @pytest.mark.parametrize("check_type,counts,cost_type,expected_counts", [
+        ("basic", (3, 0, 0), CostType.FREE, {"free": 2, "basic": 0, "full": 0}),
+        ("basic", (0, 2, 0), CostType.BASIC, {"free": 0, "basic": 1, "full": 0}),
+        ("full", (3, 0, 2), CostType.FULL, {"free": 3, "basic": 0, "full": 1}),
+    ], ids=["free", "basic", "full"])
+    def test_check_cost_type_workflow(self, client, db: Session, test_user, auth_headers, shared_file_id,
+                                      check_type, counts, cost_type, expected_counts):
+        """Test which count a check uses and what the check response and result report."""
+        # Every variant reuses the session's user and staged upload; only the
+        # (free, basic, full) counts differ, and they are rolled back afterwards
+        free, basic, full = counts
+        db.execute(
+            update(User)
+            .where(User.id == test_user.id)
+            .values(free_count=free, basic_count=basic, full_count=full)
+        )
+
+        response = client.post("/api/check", headers=auth_headers,
+            json={"file_id": shared_file_id, "filename": "test.docx", "check_type": check_type})
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["cost_type"] == cost_type.value
+
+        # Verify only the expected count was deducted
+        assert data["remaining_counts"] == expected_counts
 
         # Get result (full check should include AI results if enabled)
-        result = client.get(f"/api/check/{check_id}", headers=headers).json()["data"]
-        assert result["check_type"] == "full"
+        result = client.get(f"/api/check/{data['check_id']}", headers=auth_headers).json()["data"]
+        assert result["check_type"] == CheckType(check_type).value
+        assert result["cost_type"] == cost_type.value
 
-    def test_check_revision_with_fixes_applied(self, client, db: Session, temp_upload_dir):
+    @pytest.mark.real_pipeline
+    def test_check_revision_with_fixes_applied(self, client, db: Session, margin_docx_bytes):
         """Test that revision actually applies fixes to the document."""
-        from docx import Document
-        from docx.shared import Mm
-
-        # Create document with known issues
-        doc = Document()
-        section = doc.sections[0]
-        section.top_margin = Mm(10)  # Wrong margin
-        doc.add_paragraph("Test paragraph")
-
-        docx_path = os.path.join(temp_upload_dir, "fixable.docx")
-        doc.save(docx_path)
-
-        # Register user
-        register = client.post("/api/auth/register", json={
-            "username": "fix_user", "password": "pass123", "nickname": "Fix User"
-        })
-        token = register.json()["data"]["access_token"]
-        headers = {"Authorization": f"Bearer {token}"}
-
-        # Upload and check
-        with open(docx_path, "rb") as f:
-            upload = client.post("/api/check/upload", headers=headers,
-                files={"file": ("fixable.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                data={"check_type": "basic"})
-        file_id = upload.json()["data"]["file_id"]
-
-        check = client.post("/api/check", headers=headers,
-            json={"file_id": file_id, "filename": "fixable.docx", "check_type": "basic"})
-        check_id = check.json()["data"]["check_id"]
+        # Upload a document with known issues (wrong margins) and check it
+        flow = run_basic_flow(client, "fix_user", docx_bytes=margin_docx_bytes)
+        check_id = flow["check_id"]
 
         # Generate revision
-        revise = client.post(f"/api/check/{check_id}/revise", headers=headers)
+        revise = client.post(f"/api/check/{check_id}/revise", headers=flow["headers"])
         assert revise.status_code == 200
 
         # Verify revised document exists and can be opened
-        check_record = db.query(Check).filter(Check.check_id == check_id).first()
-        assert check_record.revised_file_path is not None
-
-        revised_doc = Document(check_record.revised_file_path)
+        revised_doc = Document(assert_revision_complete(db, check_id))
         assert len(revised_doc.paragraphs) > 0
 
-    def test_user_stats_after_multiple_checks(self, client, db: Session, sample_docx_path):
+    def test_user_stats_after_multiple_checks(self, client, db: Session, sample_docx_bytes):
         """Test user statistics are correctly updated after multiple checks."""
-        # Register user
-        register = client.post("/api/auth/register", json={
-            "username": "stats_user", "password": "pass123", "nickname": "Stats User"
-        })
-        token = register.json()["data"]["access_token"]
-        headers = {"Authorization": f"Bearer {token}"}
+        headers = register_user(client, "stats_user")["headers"]
 
         # Submit 3 basic checks
         for i in range(3):
-            with open(sample_docx_path, "rb") as f:
-                upload = client.post("/api/check/upload", headers=headers,
-                    files={"file": (f"test{i}.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")},
-                    data={"check_type": "basic"})
-            file_id = upload.json()["data"]["file_id"]
-            client.post("/api/check", headers=headers,
-                json={"file_id": file_id, "filename": f"test{i}.docx", "check_type": "basic"})
+            upload_and_check(client, headers, sample_docx_bytes, filename=f"test{i}.docx")
 
         # Get stats
         stats = client.get("/api/check/stats", headers=headers).json()["data"]
@@ -405,14 +254,11 @@ class TestEndToEndWorkflow:
         assert history["total"] == 3
         assert len(history["checks"]) == 3
 
-    def test_error_recovery_workflow(self, client, db: Session):
+    def test_error_recovery_workflow(self, client, db: Session, test_user, auth_headers):
         """Test that system recovers gracefully from errors without corrupting counts."""
-        # Register user
-        register = client.post("/api/auth/register", json={
-            "username": "error_user", "password": "pass123", "nickname": "Error User"
-        })
-        token = register.json()["data"]["access_token"]
-        headers = {"Authorization": f"Bearer {token}"}
+        # Any authenticated identity will do, so use the session's test user
+        # rather than registering one
+        headers = auth_headers
 
         # Get initial profile
         initial = client.get("/api/auth/user/profile", headers=headers).json()["data"]
@@ -2,12 +2,15 @@
 Integration tests for Rule Template API.
 """
 import pytest
-import os
-import tempfile
+import hashlib
 from io import BytesIO
 from sqlalchemy.orm import Session
-from app.models import RuleTemplate, TemplateType
-from docx import Document
+from app.models import RuleTemplate
+from app.api import rule_templates as rule_templates_api
+from app.services.ai_rule_parser import AIRuleParser
+from app.services.docx_parser import DocxParser
+from app.utils.lru_cache import LRUCache
+from tests.integration._helpers import docx_files
 
 
 @pytest.mark.integration
@@ -35,18 +38,14 @@ class TestRuleTemplatesAPI:
         for template in data["data"]["templates"]:
             assert template["template_type"] == "system"
 
-    def test_get_rule_templates_custom_authenticated(self, client, auth_headers, test_user, db: Session):
+    def test_get_rule_templates_custom_authenticated(self, client, auth_headers, custom_template_factory):
         """Test getting custom templates when authenticated."""
         # Create a custom template
-        custom_template = RuleTemplate(
+        custom_template_factory(
             name="Custom Template",
             description="User's custom template",
-            template_type=TemplateType.CUSTOM,
-            user_id=test_user.id,
             config_json={"page": {"margins": {"top_cm": 2.5}}}
         )
-        db.add(custom_template)
-        db.commit()
 
         response = client.get(
             "/api/rule-templates?template_type=custom",
@@ -59,6 +58,18 @@ class TestRuleTemplatesAPI:
         # Should have at least the custom template
         assert any(t["name"] == "Custom Template" for t in data["data"]["templates"])
 
+    def test_get_rule_templates_single_query(self, client, auth_headers, custom_template_factory, query_log):
+        """Test that listing templates reads rule_templates once however many there are."""
+        for i in range(5):
+            custom_template_factory(name=f"Template {i}")
+
+        response = client.get("/api/rule-templates", headers=auth_headers)
+
+        assert response.status_code == 200
+        assert len(response.json()["data"]["templates"]) >= 5
+        template_queries = [q for q in query_log if "FROM rule_templates" in q]
+        assert len(template_queries) == 1, "\n".join(template_queries)
+
     def test_get_rule_template_by_id(self, client, sample_rule_template):
         """Test getting a specific template by ID."""
         response = client.get(f"/api/rule-templates/{sample_rule_template.id}")
@@ -128,18 +139,10 @@ class TestRuleTemplatesAPI:
 
         assert response.status_code in [401, 403]
 
-    def test_update_rule_template_custom(self, client, auth_headers, test_user, db: Session):
+    def test_update_rule_template_custom(self, client, auth_headers, custom_template_factory, db: Session):
         """Test updating a custom template."""
         # Create a custom template
-        template = RuleTemplate(
-            name="Original Name",
-            description="Original description",
-            template_type=TemplateType.CUSTOM,
-            user_id=test_user.id,
-            config_json={}
-        )
-        db.add(template)
-        db.commit()
+        template = custom_template_factory(name="Original Name", description="Original description")
 
         update_data = {
             "name": "Updated Name",
@@ -162,71 +165,9 @@ class TestRuleTemplatesAPI:
         assert template.name == "Updated Name"
         assert template.description == "Updated description"
 
-    def test_update_rule_template_system_forbidden(self, client, auth_headers, sample_rule_template):
-        """Test that system templates cannot be updated."""
-        update_data = {
-            "name": "Hacked Name"
-        }
-
-        response = client.put(
-            f"/api/rule-templates/{sample_rule_template.id}",
-            headers=auth_headers,
-            json=update_data
-        )
-
-        assert response.status_code == 200
-        data = response.json()
-        assert data["code"] == 1003
-        assert "不能修改" in data["message"]
-
-    def test_update_rule_template_other_user_forbidden(self, client, auth_headers, db: Session, test_user):
-        """Test that users cannot update other users' templates."""
-        from app.models import User
-        from app.core.security import get_password_hash
-
-        # Create another user
-        other_user = User(
-            username="other_user",
-            password_hash=get_password_hash("password"),
-            nickname="Other"
-        )
-        db.add(other_user)
-        db.commit()
-
-        # Create template for other user
-        template = RuleTemplate(
-            name="Other's Template",
-            template_type=TemplateType.CUSTOM,
-            user_id=other_user.id,
-            config_json={}
-        )
-        db.add(template)
-        db.commit()
-
-        update_data = {"name": "Stolen"}
-
-        response = client.put(
-            f"/api/rule-templates/{template.id}",
-            headers=auth_headers,
-            json=update_data
-        )
-
-        assert response.status_code == 200
-        data = response.json()
-        assert data["code"] == 1003
-        assert "无权" in data["message"]
-
-    def test_delete_rule_template_custom(self, client, auth_headers, test_user, db: Session):
+    def test_delete_rule_template_custom(self, client, auth_headers, custom_template_factory, db: Session):
         """Test deleting a custom template."""
-        template = RuleTemplate(
-            name="To Delete",
-            template_type=TemplateType.CUSTOM,
-            user_id=test_user.id,
-            config_json={}
-        )
-        db.add(template)
-        db.commit()
-        template_id = template.id
+        template_id = custom_template_factory(name="To Delete").id
 
         response = client.delete(
             f"/api/rule-templates/{template_id}",
@@ -241,45 +182,36 @@ class TestRuleTemplatesAPI:
         deleted_template = db.query(RuleTemplate).filter(RuleTemplate.id == template_id).first()
         assert deleted_template is None
 
-    def test_delete_rule_template_system_forbidden(self, client, auth_headers, sample_rule_template):
-        """Test that system templates cannot be deleted."""
-        response = client.delete(
+    @pytest.mark.parametrize("method,expected_message", [
+        ("PUT", "不能修改"),
+        ("DELETE", "不能删除"),
+    ], ids=["update", "delete"])
+    def test_modify_system_template_forbidden(self, client, auth_headers, sample_rule_template,
+                                              method, expected_message):
+        """Test that system templates cannot be updated or deleted."""
+        response = client.request(
+            method,
             f"/api/rule-templates/{sample_rule_template.id}",
-            headers=auth_headers
+            headers=auth_headers,
+            json={"name": "Stolen"} if method == "PUT" else None
         )
 
         assert response.status_code == 200
         data = response.json()
         assert data["code"] == 1003
-        assert "不能删除" in data["message"]
-
-    def test_delete_rule_template_other_user_forbidden(self, client, auth_headers, db: Session, test_user):
-        """Test that users cannot delete other users' templates."""
-        from app.models import User
-        from app.core.security import get_password_hash
-
-        # Create another user
-        other_user = User(
-            username="another_user",
-            password_hash=get_password_hash("password"),
-            nickname="Another"
-        )
-        db.add(other_user)
-        db.commit()
-
-        # Create template for other user
-        template = RuleTemplate(
-            name="Protected Template",
-            template_type=TemplateType.CUSTOM,
-            user_id=other_user.id,
-            config_json={}
-        )
-        db.add(template)
-        db.commit()
+        assert expected_message in data["message"]
 
-        response = client.delete(
+    @pytest.mark.parametrize("method", ["PUT", "DELETE"], ids=["update", "delete"])
+    def test_modify_other_user_template_forbidden(self, client, auth_headers, other_user,
+                                                  custom_template_factory, method):
+        """Test that other users' templates cannot be updated or deleted."""
+        template = custom_template_factory(name="Other's Template", user_id=other_user.id)
+
+        response = client.request(
+            method,
             f"/api/rule-templates/{template.id}",
-            headers=auth_headers
+            headers=auth_headers,
+            json={"name": "Stolen"} if method == "PUT" else None
         )
 
         assert response.status_code == 200
@@ -287,41 +219,14 @@ class TestRuleTemplatesAPI:
         assert data["code"] == 1003
         assert "无权" in data["message"]
 
-    def test_parse_docx_to_rule(self, client, auth_headers, temp_upload_dir):
+    def test_parse_docx_to_rule(self, client, auth_headers, sample_format_docx_bytes):
         """Test parsing docx file to extract rule configuration."""
-        # Create a sample docx with specific formatting
-        doc = Document()
-
-        # Set page margins
-        section = doc.sections[0]
-        from docx.shared import Mm
-        section.top_margin = Mm(25)
-        section.bottom_margin = Mm(25)
-        section.left_margin = Mm(32)
-        section.right_margin = Mm(25)
-
-        # Add headings with different styles
-        heading1 = doc.add_heading('第一章 绪论', 1)
-        heading1.alignment = 0  # Center (not working in test, but structure is there)
-
-        doc.add_heading('第一节 研究背景', 2)
-
-        # Add body paragraph
-        para = doc.add_paragraph('这是正文内容，用于测试格式提取功能。')
-        from docx.shared import Pt
-        para.runs[0].font.name = '宋体'
-        para.runs[0].font.size = Pt(14)
-
-        file_path = os.path.join(temp_upload_dir, "sample_format.docx")
-        doc.save(file_path)
-
-        # Upload file for parsing
-        with open(file_path, "rb") as f:
-            response = client.post(
-                "/api/rule-templates/parse/docx",
-                headers=auth_headers,
-                files={"file": ("sample_format.docx", f, "application/vnd.openxmlformats-officedocument.wordprocessingml.document")}
-            )
+        # Upload a sample docx with specific formatting for parsing
+        response = client.post(
+            "/api/rule-templates/parse/docx",
+            headers=auth_headers,
+            files=docx_files("sample_format.docx", BytesIO(sample_format_docx_bytes))
+        )
 
         assert response.status_code == 200
         data = response.json()
@@ -334,8 +239,62 @@ class TestRuleTemplatesAPI:
         assert "page" in config
         assert "body" in config
 
-    def test_parse_text_to_rule(self, client, auth_headers):
-        """Test parsing natural language text to rule configuration."""
+    def test_parse_docx_to_rule_cached(self, client, auth_headers, sample_format_docx_bytes, monkeypatch, mocker):
+        """Test that re-uploading the same docx reuses the parsed result."""
+        monkeypatch.setattr(rule_templates_api, "_docx_parse_cache", LRUCache(max_entries=4, max_bytes=64 * 1024 * 1024))
+        parse = mocker.spy(DocxParser, "parse")
+
+        responses = [
+            client.post(
+                "/api/rule-templates/parse/docx",
+                headers=auth_headers,
+                files=docx_files("sample_format.docx", BytesIO(sample_format_docx_bytes))
+            )
+            for _ in range(2)
+        ]
+
+        assert parse.call_count == 1
+        assert responses[0].json() == responses[1].json()
+        assert responses[0].headers["etag"] == responses[1].headers["etag"]
+        assert responses[0].headers["etag"] == f'"{hashlib.sha256(sample_format_docx_bytes).hexdigest()}"'
+
+    def test_parse_docx_to_rule_invalid_file(self, client, auth_headers):
+        """Test that a failed parse reports an error without an ETag."""
+        response = client.post(
+            "/api/rule-templates/parse/docx",
+            headers=auth_headers,
+            files=docx_files("broken.docx", BytesIO(b"not a docx"))
+        )
+
+        assert response.json()["code"] == 1001
+        assert "etag" not in response.headers
+
+    def test_parse_text_to_rule(self, client, auth_headers, monkeypatch):
+        """Test parsing natural language text to rule configuration (AI parser stubbed)."""
+        config = {
+            "page": {"margins": {"top_cm": 2.5, "bottom_cm": 2.5, "left_cm": 3.0, "right_cm": 3.0}},
+            "body": {"font": "宋体", "size_pt": 14, "line_spacing_pt": 28}
+        }
+
+        async def _parse_text(self, text):
+            return config
+
+        monkeypatch.setattr(AIRuleParser, "parse_text", _parse_text)
+
+        response = client.post(
+            "/api/rule-templates/parse/text",
+            params={"text": "要求使用宋体14磅字，行距28磅，页边距上下2.5厘米，左右3厘米"},
+            headers=auth_headers
+        )
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["code"] == 200
+        assert data["data"]["config"] == config
+
+    @pytest.mark.ai
+    def test_parse_text_to_rule_live(self, client, auth_headers):
+        """Test parsing natural language text with the configured AI service."""
         text = "要求使用宋体14磅字，行距28磅，页边距上下2.5厘米，左右3厘米"
 
         response = client.post(
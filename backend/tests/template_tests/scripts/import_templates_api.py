@@ -9,6 +9,8 @@ import sys
 from pathlib import Path
 import asyncio
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
 
 # 添加项目根目录到路径（backend目录）
 backend_root = Path(__file__).parent.parent.parent.parent
@@ -24,14 +26,16 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-async def import_template_from_file(file_path: str, template_name: str, description: str, db):
+def parse_template_file(file_path: str, template_name: str) -> Optional[dict]:
     """
-    使用现有功能导入模板
+    使用现有功能解析模板文件
 
     模拟 parse_docx_to_rule 的逻辑：
     1. 使用 DocxParser 解析文档
     2. 调用 _extract_config_from_doc_data 提取配置
-    3. 保存为系统模板
+
+    Returns:
+        提取出的配置；文件不存在或解析失败时返回 None
     """
     logger.info(f"=" * 60)
     logger.info(f"开始处理模板: {template_name}")
@@ -39,7 +43,7 @@ async def import_template_from_file(file_path: str, template_name: str, descript
 
     if not os.path.exists(file_path):
         logger.error(f"文件不存在: {file_path}")
-        return False
+        return None
 
     try:
         # 步骤1: 使用现有的 DocxParser 解析文档
@@ -75,44 +79,55 @@ async def import_template_from_file(file_path: str, template_name: str, descript
                        f"行距{body['line_spacing_pt']}磅, "
                        f"首行缩进{body['first_line_indent_chars']}字符")
 
-        # 步骤3: 保存到数据库（模拟 create_rule_template 逻辑）
-        logger.info("💾 步骤3: 保存到数据库...")
+        return config
+
+    except Exception as e:
+        logger.error(f"❌ 处理失败: {str(e)}")
+        import traceback
+        logger.error(traceback.format_exc())
+        return None
 
-        # 检查是否已存在同名模板
-        existing_template = db.query(RuleTemplate).filter(
-            RuleTemplate.name == template_name,
+
+def save_templates(parsed: List[Tuple[dict, dict]], db) -> None:
+    """
+    保存解析出的模板（模拟 create_rule_template 逻辑）
+
+    一次查询取出所有同名系统模板，新建/更新后统一提交一次
+
+    Args:
+        parsed: (模板配置项, 提取出的配置) 列表
+    """
+    logger.info("💾 保存到数据库...")
+
+    # 检查是否已存在同名模板
+    names = [template_config["name"] for template_config, _ in parsed]
+    existing_templates = {
+        template.name: template
+        for template in db.query(RuleTemplate).filter(
+            RuleTemplate.name.in_(names),
             RuleTemplate.template_type == TemplateType.SYSTEM
-        ).first()
+        ).all()
+    }
 
+    for template_config, config in parsed:
+        existing_template = existing_templates.get(template_config["name"])
         if existing_template:
-            logger.info(f"更新现有模板 (ID: {existing_template.id})...")
-            existing_template.description = description
+            logger.info(f"更新现有模板: {template_config['name']} (ID: {existing_template.id})")
+            existing_template.description = template_config["description"]
             existing_template.config_json = config
-            db.commit()
-            db.refresh(existing_template)
-            logger.info(f"✅ 成功更新模板: {template_name} (ID: {existing_template.id})")
         else:
-            logger.info("创建新模板...")
-            template = RuleTemplate(
-                name=template_name,
-                description=description,
+            logger.info(f"创建新模板: {template_config['name']}")
+            db.add(RuleTemplate(
+                name=template_config["name"],
+                description=template_config["description"],
                 template_type=TemplateType.SYSTEM,
                 config_json=config,
                 is_default=False,
                 use_count=0
-            )
-            db.add(template)
-            db.commit()
-            db.refresh(template)
-            logger.info(f"✅ 成功创建模板: {template_name} (ID: {template.id})")
-
-        return True
+            ))
 
-    except Exception as e:
-        logger.error(f"❌ 处理失败: {str(e)}")
-        import traceback
-        logger.error(traceback.format_exc())
-        return False
+    db.commit()
+    logger.info(f"✅ 成功保存 {len(parsed)} 个模板")
 
 
 async def main():
@@ -139,25 +154,36 @@ async def main():
         }
     ]
 
+    # 并行解析所有模板文件（CPU 密集，互不依赖，放到进程池里）
+    loop = asyncio.get_running_loop()
+    max_workers = min(len(templates), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        configs = await asyncio.gather(*[
+            loop.run_in_executor(executor, parse_template_file,
+                                 template_config["file_path"], template_config["name"])
+            for template_config in templates
+        ])
+    parsed = [
+        (template_config, config)
+        for template_config, config in zip(templates, configs)
+        if config is not None
+    ]
+
     # 获取数据库会话
     db = SessionLocal()
 
     try:
         success_count = 0
-        fail_count = 0
-
-        for template_config in templates:
-            result = await import_template_from_file(
-                file_path=template_config["file_path"],
-                template_name=template_config["name"],
-                description=template_config["description"],
-                db=db
-            )
-
-            if result:
-                success_count += 1
-            else:
-                fail_count += 1
+        fail_count = len(templates) - len(parsed)
+
+        if parsed:
+            try:
+                save_templates(parsed, db)
+                success_count = len(parsed)
+            except Exception as e:
+                db.rollback()
+                logger.error(f"❌ 保存失败: {str(e)}")
+                fail_count = len(templates)
 
         # 打印统计信息
         logger.info("")
@@ -4,7 +4,13 @@ Unit tests for DOCX Parser.
 import pytest
 import os
 from docx import Document
-from app.services.docx_parser import DocxParser, parse_document_safe, contains_chinese, contains_english
+from app.services.docx_parser import (
+    DocxParser,
+    clear_parse_cache,
+    contains_chinese,
+    contains_english,
+    parse_document_safe,
+)
 
 
 @pytest.mark.unit
@@ -12,6 +18,13 @@ from app.services.docx_parser import DocxParser, parse_document_safe, contains_c
 class TestDocxParser:
     """Test cases for DocxParser."""
 
+    @pytest.fixture(autouse=True)
+    def fresh_parse_cache(self):
+        """Start and end every test with an empty parse cache."""
+        clear_parse_cache()
+        yield
+        clear_parse_cache()
+
     def test_init_with_valid_file(self, sample_docx_path):
         """Test parser initialization with valid file."""
         parser = DocxParser(sample_docx_path)
@@ -179,6 +192,22 @@ class TestDocxParser:
         assert "data" in result
         assert isinstance(result["data"], dict)
 
+    def test_parse_document_safe_cached_by_content(self, sample_docx_path, temp_upload_dir, mocker):
+        """Test that identical content is parsed once and copies are independent."""
+        import shutil
+        copy_path = os.path.join(temp_upload_dir, "copy.docx")
+        shutil.copy(sample_docx_path, copy_path)
+        parse = mocker.spy(DocxParser, "parse")
+
+        first = parse_document_safe(sample_docx_path)
+        first["data"]["paragraphs"].clear()
+        second = parse_document_safe(copy_path)
+
+        assert parse.call_count == 1
+        assert second["success"] is True
+        assert second["data"]["info"]["filename"] == "copy.docx"
+        assert len(second["data"]["paragraphs"]) > 0
+
     def test_parse_document_safe_file_not_found(self):
         """Test safe document parsing with non-existent file."""
         result = parse_document_safe("/path/to/nonexistent.docx")
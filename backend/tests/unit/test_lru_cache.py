@@ -0,0 +1,45 @@
+"""
+Unit tests for the LRU cache helper.
+"""
+import pytest
+from app.utils.lru_cache import LRUCache
+
+
+@pytest.mark.unit
+class TestLRUCache:
+    """Test cases for LRUCache."""
+
+    def test_get_returns_independent_copy(self):
+        """Test that modifying a returned value leaves the cached one intact."""
+        cache = LRUCache(max_entries=4, max_bytes=100)
+        value = {"paragraphs": [1, 2]}
+        cache.put("a", value, size=10)
+        value["paragraphs"].clear()
+
+        cache.get("a")["paragraphs"].clear()
+
+        assert cache.get("a") == {"paragraphs": [1, 2]}
+
+    def test_evicts_least_recently_used_by_count(self):
+        """Test that the oldest unused entry is evicted past max_entries."""
+        cache = LRUCache(max_entries=2, max_bytes=100)
+        cache.put("a", 1, size=1)
+        cache.put("b", 2, size=1)
+        cache.get("a")
+        cache.put("c", 3, size=1)
+
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+
+    def test_evicts_by_total_size(self):
+        """Test that entries are evicted to stay within max_bytes."""
+        cache = LRUCache(max_entries=10, max_bytes=100)
+        cache.put("a", 1, size=60)
+        cache.put("b", 2, size=60)
+        cache.put("huge", 3, size=101)
+
+        assert cache.get("a") is None
+        assert cache.get("b") == 2
+        assert cache.get("huge") is None
+        assert cache.total_bytes == 60